@@ -0,0 +1,36 @@
+"""add users.activity_count
+
+Revision ID: 3e7b5c1d9a02
+Revises: 8c1f2a9d3b47
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3e7b5c1d9a02'
+down_revision: Union[str, None] = '8c1f2a9d3b47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('activity_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_index('ix_users_activity_count', 'users', ['activity_count'], unique=False)
+
+    # 既存のアクティビティ数をバックフィル
+    op.execute(
+        "UPDATE users SET activity_count = "
+        "(SELECT COUNT(*) FROM user_activities WHERE user_activities.user_id = users.id)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_activity_count', table_name='users')
+    op.drop_column('users', 'activity_count')
@@ -0,0 +1,63 @@
+"""add blobs table for content-addressed attachments
+
+Revision ID: 6a2f9e4c8d10
+Revises: b41d6e0c7f35
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6a2f9e4c8d10'
+down_revision: Union[str, None] = 'b41d6e0c7f35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('blobs',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=True),
+    sa.Column('content_type', sa.String(length=255), nullable=True),
+    sa.Column('storage_key', sa.String(length=255), nullable=True),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+    op.create_index('ix_blobs_ref_count_updated_at', 'blobs', ['ref_count', 'updated_at'], unique=False)
+
+    # 既存の添付ファイルを blobs に登録し、参照数を数える
+    op.execute(
+        """
+        INSERT INTO blobs (sha256, size, content_type, storage_key, ref_count, created_at, updated_at)
+        SELECT sha256, MAX(size), MAX(content_type), MIN(storage_key), COUNT(*), MIN(uploaded_at), MAX(uploaded_at)
+        FROM files
+        WHERE sha256 IS NOT NULL
+        GROUP BY sha256
+        """
+    )
+    # 同じ内容のファイルは代表の1つを参照する（他の本体は後から手動で削除できる）
+    op.execute(
+        """
+        UPDATE files SET storage_key = (
+            SELECT blobs.storage_key FROM blobs WHERE blobs.sha256 = files.sha256
+        )
+        WHERE sha256 IS NOT NULL
+        """
+    )
+    op.create_index(op.f('ix_files_sha256'), 'files', ['sha256'], unique=False)
+    op.create_foreign_key('fk_files_sha256_blobs', 'files', 'blobs', ['sha256'], ['sha256'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('fk_files_sha256_blobs', 'files', type_='foreignkey')
+    op.drop_index(op.f('ix_files_sha256'), table_name='files')
+    op.drop_index('ix_blobs_ref_count_updated_at', table_name='blobs')
+    op.drop_table('blobs')
@@ -0,0 +1,28 @@
+"""add knowledge created_at/id index for keyset pagination
+
+Revision ID: 8c1f2a9d3b47
+Revises: 5d471a54ead8
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c1f2a9d3b47'
+down_revision: Union[str, None] = '5d471a54ead8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_knowledges_created_at_id', 'knowledges', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_knowledges_created_at_id', table_name='knowledges')
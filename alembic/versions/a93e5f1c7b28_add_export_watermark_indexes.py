@@ -0,0 +1,32 @@
+"""add watermark indexes for incremental exports
+
+Revision ID: a93e5f1c7b28
+Revises: f2b8d4e6a193
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a93e5f1c7b28'
+down_revision: Union[str, None] = 'f2b8d4e6a193'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_knowledges_updated_at_id', 'knowledges', ['updated_at', 'id'], unique=False)
+    op.create_index('ix_comments_created_at_id', 'comments', ['created_at', 'id'], unique=False)
+    op.create_index('ix_user_activities_timestamp_id', 'user_activities', ['timestamp', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_user_activities_timestamp_id', table_name='user_activities')
+    op.drop_index('ix_comments_created_at_id', table_name='comments')
+    op.drop_index('ix_knowledges_updated_at_id', table_name='knowledges')
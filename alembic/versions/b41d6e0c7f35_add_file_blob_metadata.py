@@ -0,0 +1,37 @@
+"""add blob metadata columns to files
+
+Revision ID: b41d6e0c7f35
+Revises: 3e7b5c1d9a02
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41d6e0c7f35'
+down_revision: Union[str, None] = '3e7b5c1d9a02'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('files', sa.Column('content_type', sa.String(length=255), nullable=True))
+    op.add_column('files', sa.Column('size', sa.BigInteger(), nullable=True))
+    op.add_column('files', sa.Column('sha256', sa.String(length=64), nullable=True))
+    op.add_column('files', sa.Column('storage_key', sa.String(length=255), nullable=True))
+    # 保存先はstorage_keyで管理するため、file_urlは必須にしない
+    op.alter_column('files', 'file_url', existing_type=sa.String(length=255), nullable=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column('files', 'file_url', existing_type=sa.String(length=255), nullable=False)
+    op.drop_column('files', 'storage_key')
+    op.drop_column('files', 'sha256')
+    op.drop_column('files', 'size')
+    op.drop_column('files', 'content_type')
@@ -0,0 +1,42 @@
+"""add knowledges.comment_count/file_count and comment pagination index
+
+Revision ID: c4d8e2f6a057
+Revises: a93e5f1c7b28
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d8e2f6a057'
+down_revision: Union[str, None] = 'a93e5f1c7b28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('knowledges', sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('knowledges', sa.Column('file_count', sa.Integer(), server_default='0', nullable=False))
+
+    # 既存のコメント数・ファイル数をバックフィル（更新日時は変えない）
+    op.execute(
+        "UPDATE knowledges SET "
+        "comment_count = (SELECT COUNT(*) FROM comments WHERE comments.knowledge_id = knowledges.id), "
+        "file_count = (SELECT COUNT(*) FROM files WHERE files.knowledge_id = knowledges.id), "
+        "updated_at = updated_at"
+    )
+    op.create_index(
+        'ix_comments_knowledge_id_created_at_id', 'comments', ['knowledge_id', 'created_at', 'id'], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_comments_knowledge_id_created_at_id', table_name='comments')
+    op.drop_column('knowledges', 'file_count')
+    op.drop_column('knowledges', 'comment_count')
@@ -0,0 +1,42 @@
+"""add avatar etag and avatar variants
+
+Revision ID: d7c3a81f5e26
+Revises: 6a2f9e4c8d10
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7c3a81f5e26'
+down_revision: Union[str, None] = '6a2f9e4c8d10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('avatar_etag', sa.String(length=64), nullable=True))
+    # 既存のアバター画像のハッシュを計算しておく（縮小版は python -m utils.avatars で作成する）
+    op.execute("UPDATE users SET avatar_etag = SHA2(avatar_data, 256) WHERE avatar_data IS NOT NULL")
+
+    op.create_table('user_avatars',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('variant', sa.String(length=16), nullable=False),
+    sa.Column('content_type', sa.String(length=50), nullable=True),
+    sa.Column('data', sa.LargeBinary(length=16777216), nullable=True),
+    sa.Column('etag', sa.String(length=64), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'variant')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_avatars')
+    op.drop_column('users', 'avatar_etag')
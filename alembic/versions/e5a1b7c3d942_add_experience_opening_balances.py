@@ -0,0 +1,35 @@
+"""record existing experience as opening balances in user_activities
+
+Revision ID: e5a1b7c3d942
+Revises: c4d8e2f6a057
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a1b7c3d942'
+down_revision: Union[str, None] = 'c4d8e2f6a057'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # これまでの経験値は台帳に記録されていないため、残高として1行ずつ引き継ぐ
+    # （python -m utils.experience で台帳からレベルを作り直しても値が変わらないようにする）
+    op.execute(
+        "INSERT INTO user_activities (user_id, action, xp_amount, timestamp) "
+        "SELECT id, 'opening_balance', COALESCE(experience_points, 0) + COALESCE(current_xp, 0), "
+        "COALESCE(created_at, CURRENT_TIMESTAMP) "
+        "FROM users WHERE COALESCE(experience_points, 0) + COALESCE(current_xp, 0) > 0"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DELETE FROM user_activities WHERE action = 'opening_balance'")
@@ -0,0 +1,46 @@
+"""move avatar data from users to user_avatars
+
+Revision ID: f2b8d4e6a193
+Revises: d7c3a81f5e26
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b8d4e6a193'
+down_revision: Union[str, None] = 'd7c3a81f5e26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 画像本体を user_avatars の original に移してから users の列を削除する
+    op.execute(
+        """
+        INSERT INTO user_avatars (user_id, variant, content_type, data, etag, created_at)
+        SELECT id, 'original', avatar_content_type, avatar_data, SHA2(avatar_data, 256), updated_at
+        FROM users
+        WHERE avatar_data IS NOT NULL
+        """
+    )
+    op.drop_column('users', 'avatar_data')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('users', sa.Column('avatar_data', sa.LargeBinary(), nullable=True))
+    op.execute(
+        """
+        UPDATE users SET avatar_data = (
+            SELECT user_avatars.data FROM user_avatars
+            WHERE user_avatars.user_id = users.id AND user_avatars.variant = 'original'
+        )
+        """
+    )
+    op.execute("DELETE FROM user_avatars WHERE variant = 'original'")
@@ -0,0 +1,2 @@
+# テストで使うフィクスチャ（クエリ数の上限チェック）
+pytest_plugins = ["utils.pytest_query_budget"]
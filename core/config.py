@@ -19,10 +19,53 @@ class Settings(BaseSettings):
     MYSQL_SSL_MODE: str
     DATABASE_URL: Optional[str] = None
 
+    # コネクションプール設定
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE_SECONDS: int = 1800  # Azure側でアイドル接続が切られる前に作り直す
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_POOL_WARMUP_CONNECTIONS: int = 5  # 起動時に作っておく接続数（0で無効）
+
+    # 同じ形のSELECTがこの回数以上実行されたリクエストをN+1の疑いとして警告する
+    SQL_N_PLUS_ONE_THRESHOLD: int = 5
+
     # Azure Storage設定
     AZURE_STORAGE_CONNECTION_STRING: str
     AZURE_STORAGE_CONTAINER_NAME: str
 
+    # 添付ファイルの保存先（"azure" または "local"）
+    BLOB_STORE_BACKEND: str = "local"
+    LOCAL_BLOB_STORE_PATH: str = "storage"
+    BLOB_SWEEP_INTERVAL_SECONDS: float = 3600.0  # 参照されなくなった添付ファイルを回収する間隔
+    BLOB_ORPHAN_GRACE_SECONDS: float = 3600.0  # アップロード中のファイルを消さないための猶予
+
+    # エクスポート設定
+    EXPORT_ALLOWED_EMAILS: str = ""  # /export を使えるユーザーのメールアドレス（カンマ区切り。空なら誰も使えない）
+    EXPORT_WATERMARK_LAG_SECONDS: float = 60.0  # 書き込み中の行を取りこぼさないため、直近この秒数の行は次回に回す
+
+    # 一括登録設定
+    BULK_IMPORT_ALLOWED_EMAILS: str = ""  # /knowledge/bulk を使えるユーザーのメールアドレス（カンマ区切り。空なら誰も使えない）
+
+    # パスワードハッシュ（bcrypt）のスレッドプール設定
+    PASSWORD_HASH_WORKERS: int = 2  # 同時に実行するbcryptの数
+    PASSWORD_HASH_MAX_QUEUE: int = 32  # これを超えて待たせず503を返す
+
+    # 認証済みユーザーキャッシュ設定
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 60.0
+    PRINCIPAL_CACHE_MAX_SIZE: int = 10000
+
+    # レスポンスキャッシュ設定（ランキング・人気ナレッジ）
+    RESPONSE_CACHE_TTL_SECONDS: float = 30.0
+    RESPONSE_CACHE_MAX_SIZE: int = 1000
+
+    # レベルアップに必要な経験値（カンマ区切りでレベル1→2, 2→3, ...。最後の値を以降のレベルで繰り返す）
+    LEVEL_XP_REQUIREMENTS: str = "100"
+
+    # 閲覧数バッファ設定
+    VIEW_COUNT_FLUSH_INTERVAL_SECONDS: float = 5.0
+    VIEW_COUNT_READ_YOUR_VIEWS: bool = True  # 詳細レスポンスに未反映の閲覧数を含める
+
     class Config:
         env_file = ".env"
         case_sensitive = False  # 環境変数名の大文字小文字を区別しない
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, TypeVar
+
+from fastapi import HTTPException, status
+
+T = TypeVar("T")
+
+
+class PasswordHasherPool:
+    """
+    bcryptのハッシュ化・照合を専用のスレッドプールで実行する
+
+    bcryptは1回あたり数十ミリ秒CPUを使うため、イベントループ上で実行すると
+    その間ワーカーの他のリクエストが止まる。bcryptはGILを解放するので、
+    スレッドプールに出せばループは止まらない。
+    同時実行数は max_workers、待ち行列は max_queue までに制限し、
+    溢れた場合は待たせずに503を返す。
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._queued = 0
+        self._running = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.queue_depth_max = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.run_seconds_total = 0.0
+        self.completed = 0
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        """fn(*args) をプールで実行する（待ち行列が満杯なら503）"""
+        with self._lock:
+            if self._queued >= self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="ただいま混み合っています。しばらくしてから再度お試しください",
+                    headers={"Retry-After": "1"},
+                )
+            self._queued += 1
+            self.submitted += 1
+            self.queue_depth_max = max(self.queue_depth_max, self._queued)
+        submitted_at = time.perf_counter()
+
+        def run() -> T:
+            started_at = time.perf_counter()
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                wait = started_at - submitted_at
+                self.wait_seconds_total += wait
+                self.wait_seconds_max = max(self.wait_seconds_max, wait)
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self.completed += 1
+                    self.run_seconds_total += time.perf_counter() - started_at
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, run)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self._queued,
+                "queue_depth_max": self.queue_depth_max,
+                "running": self._running,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "wait_seconds_avg": self.wait_seconds_total / self.completed if self.completed else 0.0,
+                "wait_seconds_max": self.wait_seconds_max,
+                "run_seconds_avg": self.run_seconds_total / self.completed if self.completed else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,142 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.user import User, build_avatar_url
+
+
+# スナップショットに含めるカラム（画像などの大きなカラムは含めない）
+SNAPSHOT_COLUMNS = (
+    User.id,
+    User.email,
+    User.username,
+    User.department,
+    User.level,
+    User.points,
+    User.current_xp,
+    User.experience_points,
+    User.activity_count,
+    User.avatar_etag,
+)
+
+
+@dataclass
+class CurrentUser:
+    """
+    認証済みユーザーの軽量なスナップショット
+
+    アバター画像などの大きなカラムは含まない。
+    ORMの User が必要な処理（更新など）は load() で取得する。
+    """
+    id: int
+    email: str
+    username: Optional[str]
+    department: Optional[str]
+    level: int
+    points: int
+    current_xp: int
+    experience_points: int
+    activity_count: int
+    avatar_etag: Optional[str]
+
+    @property
+    def has_avatar(self) -> bool:
+        return self.avatar_etag is not None
+
+    @property
+    def avatar_url(self) -> Optional[str]:
+        return build_avatar_url(self.id, self.avatar_etag)
+
+    @property
+    def small_avatar_url(self) -> Optional[str]:
+        return build_avatar_url(self.id, self.avatar_etag, "small")
+
+    async def load(self, db: AsyncSession) -> User:
+        """ORMの User を取得する"""
+        return (await db.execute(select(User).where(User.id == self.id))).scalar_one()
+
+    @classmethod
+    async def fetch(cls, db: AsyncSession, email: str) -> Optional["CurrentUser"]:
+        """メールアドレスからスナップショットを作る"""
+        row = (await db.execute(select(*SNAPSHOT_COLUMNS).where(User.email == email))).first()
+        if row is None:
+            return None
+        return cls.from_row(row)
+
+    @classmethod
+    def from_row(cls, row) -> "CurrentUser":
+        """SNAPSHOT_COLUMNS を選択した行からスナップショットを作る"""
+        return cls(
+            id=row.id,
+            email=row.email,
+            username=row.username,
+            department=row.department,
+            level=row.level or 0,
+            points=row.points or 0,
+            current_xp=row.current_xp or 0,
+            experience_points=row.experience_points or 0,
+            activity_count=row.activity_count or 0,
+            avatar_etag=row.avatar_etag,
+        )
+
+
+class PrincipalCache:
+    """
+    トークンのsubject（メールアドレス）をキーにしたTTL付きLRUキャッシュ
+
+    ユーザー情報が変わったときは invalidate() で明示的に破棄する。
+    """
+
+    def __init__(self, ttl_seconds: float, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, CurrentUser]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, subject: str) -> Optional[CurrentUser]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[subject]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(subject)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, subject: str, user: CurrentUser) -> None:
+        with self._lock:
+            self._entries[subject] = (time.monotonic() + self.ttl_seconds, user)
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, subject: str) -> None:
+        with self._lock:
+            self._entries.pop(subject, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
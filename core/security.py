@@ -4,11 +4,14 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import os
 
 from models.database import get_db
 from models.user import User
+from core.config import settings
+from core.password_hasher import PasswordHasherPool
+from core.principal_cache import CurrentUser, PrincipalCache
 
 # 設定
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")  # 環境変数から取得、デフォルトも設定
@@ -18,6 +21,18 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 1440
 # パスワードハッシュ
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcryptを実行するスレッドプール（イベントループを止めないため）
+password_hasher = PasswordHasherPool(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+)
+
+# 認証済みユーザーのキャッシュ（トークンのsubjectがキー）
+principal_cache = PrincipalCache(
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    max_size=settings.PRINCIPAL_CACHE_MAX_SIZE,
+)
+
 # トークンエンドポイントのURLを正しく設定
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
@@ -32,6 +47,16 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+# パスワード照合（APIからはこちらを使う）
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
+
+# パスワードのハッシュ化（APIからはこちらを使う）
+async def get_password_hash_async(password: str) -> str:
+    return await password_hasher.run(get_password_hash, password)
+
+
 # アクセストークン作成
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
@@ -46,8 +71,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 # 現在のユーザー取得（JWTトークンから）
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
+    db: AsyncSession = Depends(get_db)
+) -> CurrentUser:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="認証情報が正しくありません",
@@ -62,7 +87,17 @@ async def get_current_user(
     except (JWTError, ValueError):
         raise credentials_exception
 
-    user = db.query(User).filter(User.email == user_email).first()
+    # ユーザー情報はキャッシュ済みのスナップショットを使う（アバター画像は読み込まない）
+    user = principal_cache.get(user_email)
     if user is None:
-        raise credentials_exception
+        user = await CurrentUser.fetch(db, user_email)
+        if user is None:
+            raise credentials_exception
+        principal_cache.set(user_email, user)
     return user
+
+
+# カンマ区切りのメールアドレスの許可リストに含まれるか（大文字小文字は区別しない）
+def is_allowed_email(email: str, allowed_emails: str) -> bool:
+    allowed = {allowed.strip().lower() for allowed in allowed_emails.split(",") if allowed.strip()}
+    return email.lower() in allowed
@@ -0,0 +1,20 @@
+# gunicorn の設定（startup.sh から -c で読み込む）
+import os
+import shutil
+
+# /metrics を全ワーカーで合算するため、各ワーカーが値を書き込むディレクトリ
+# （ワーカーがアプリを読み込む前に設定しておく必要がある）
+multiproc_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/rebema-metrics")
+
+
+def on_starting(server):
+    # 前回の起動時の値が残らないよう、空のディレクトリから始める
+    shutil.rmtree(multiproc_dir, ignore_errors=True)
+    os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    # 終了したワーカーの処理中リクエスト数などを合算から外す
+    # （マスターではアプリを読み込まないので utils.metrics ではなく直接呼ぶ）
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
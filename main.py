@@ -1,17 +1,55 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 from routers import auth, knowledge, ranking, profile
-from models.database import engine, Base
+from models.database import engine, Base, async_engine, AsyncSessionLocal
+from models.pool import warm_pool
 import os
-from routers import comments
+from routers import comments, export
+from utils.pagination import NEXT_CURSOR_HEADER
+from utils.view_counter import view_counter
+from utils.attachments import blob_sweeper
+from utils.blob_store import get_blob_store
+from utils.leaderboard import leaderboard
+from utils.query_stats import QueryStatsMiddleware, instrument
+from utils import metrics
+from core.config import settings
+from core.security import password_hasher
 from dotenv import load_dotenv
 load_dotenv()
 
 
 
 
-app = FastAPI(title="Rebema API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # コネクションプールに接続を作っておく
+    if settings.DB_POOL_WARMUP_CONNECTIONS > 0:
+        warmed = await warm_pool(async_engine, settings.DB_POOL_WARMUP_CONNECTIONS)
+        print(f"✅ コネクションプールのウォームアップ: {warmed}/{settings.DB_POOL_WARMUP_CONNECTIONS}")
+
+    # ランキングをDBから構築する
+    async with AsyncSessionLocal() as db:
+        await leaderboard.rebuild(db)
+
+    # 閲覧数バッファの定期反映を開始し、終了時に残りを反映する
+    view_counter.start(async_engine, settings.VIEW_COUNT_FLUSH_INTERVAL_SECONDS)
+    # 参照されなくなった添付ファイルの定期回収を開始する
+    blob_sweeper.start(
+        async_engine,
+        get_blob_store(),
+        settings.BLOB_SWEEP_INTERVAL_SECONDS,
+        settings.BLOB_ORPHAN_GRACE_SECONDS,
+    )
+    yield
+    await blob_sweeper.stop()
+    await view_counter.stop()
+    password_hasher.shutdown()
+    await async_engine.dispose()
+
+
+app = FastAPI(title="Rebema API", lifespan=lifespan)
 
 # CORS設定
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "*").split(",")
@@ -21,20 +59,35 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, export.WATERMARK_HEADER],
 )
 
+# リクエストごとのクエリ数・DB時間を Server-Timing で返し（本番以外）、N+1の疑いを警告する
+instrument(async_engine.sync_engine)
+app.add_middleware(QueryStatsMiddleware)
+# ルートごとのリクエスト数・処理時間（/metrics で公開する）
+app.add_middleware(metrics.MetricsMiddleware)
+
 # ルーターの登録
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(knowledge.router, prefix="/knowledge", tags=["knowledge"])
 app.include_router(ranking.router, prefix="/ranking", tags=["ranking"])
 app.include_router(profile.router, prefix="/profile", tags=["profile"])
+app.include_router(profile.avatar_router, prefix="/profile", tags=["profile"])
 app.include_router(comments.router)
+app.include_router(export.router, prefix="/export", tags=["export"])
 
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to Rebema API"}
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    # Prometheus形式のメトリクス（gunicornの複数ワーカーの値を合算して返す）
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
 # ✅ Swagger UIでJWTを使えるようにするカスタムOpenAPI定義
 def custom_openapi():
     if app.openapi_schema:
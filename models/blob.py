@@ -0,0 +1,21 @@
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime, Index
+from datetime import datetime
+from .database import Base
+
+class Blob(Base):
+    """添付ファイルの本体（SHA-256で一意）。同じ内容のファイルは1つだけ保存する"""
+    __tablename__ = "blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(BigInteger)
+    content_type = Column(String(255), nullable=True)
+    storage_key = Column(String(255))  # Blobストア上のキー
+    ref_count = Column(Integer, default=0, nullable=False)  # 参照している files の数
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # インデックス
+    __table_args__ = (
+        # 参照されなくなったBlobの回収用
+        Index('ix_blobs_ref_count_updated_at', 'ref_count', 'updated_at'),
+    )
@@ -0,0 +1,15 @@
+from sqlalchemy import BigInteger, Column, String, DateTime
+from datetime import datetime
+from .database import Base
+
+class CollectionVersion(Base):
+    """
+    一覧の版（条件付きGETの ETag 用）
+
+    行の削除や著者名の変更など、一覧の MAX(id) / MAX(updated_at) では分からない変更のたびに加算する。
+    """
+    __tablename__ = "collection_versions"
+
+    name = Column(String(50), primary_key=True)  # 例: "knowledges"
+    version = Column(BigInteger, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -14,4 +14,12 @@ class Comment(Base):
 
     # リレーションシップ
     knowledge = relationship("Knowledge", back_populates="comments")
-    author = relationship("User", back_populates="comments") 
\ No newline at end of file
+    author = relationship("User", back_populates="comments")
+
+    # インデックス
+    __table_args__ = (
+        # エクスポートの差分取得用 (created_at, id)
+        Index('ix_comments_created_at_id', 'created_at', 'id'),
+        # ナレッジごとのコメントのキーセットページング用 (knowledge_id, created_at, id)
+        Index('ix_comments_knowledge_id_created_at_id', 'knowledge_id', 'created_at', 'id'),
+    )
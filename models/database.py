@@ -1,10 +1,17 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
+import ssl
 from dotenv import load_dotenv
 import pymysql
 
+from core.config import settings
+from .pool import InstrumentedAsyncQueuePool
+from .unit_of_work import unit_of_work
+
 load_dotenv()
 
 # データベース接続情報を個別に取得
@@ -17,10 +24,32 @@ DB_PORT = os.getenv("MYSQL_PORT", "3306")
 # SSL証明書のパス
 SSL_CA_PATH = "DigiCertGlobalRootCA.crt.pem"
 
-# データベースURLを構築
-SQLALCHEMY_DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# 同期・非同期それぞれで使うドライバ（DATABASE_URL はどちらの形式で指定してもよい）
+SYNC_DRIVERS = {"mysql": "mysql+pymysql", "sqlite": "sqlite"}
+ASYNC_DRIVERS = {"mysql": "mysql+aiomysql", "sqlite": "sqlite+aiosqlite"}
+
+# データベースURLを構築（DATABASE_URL があればそれを使い、なければ MYSQL_* から作る）
+DATABASE_URL = make_url(
+    settings.DATABASE_URL
+    or f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+)
+BACKEND = DATABASE_URL.get_backend_name()
+SQLALCHEMY_DATABASE_URL = DATABASE_URL.set(drivername=SYNC_DRIVERS.get(BACKEND, DATABASE_URL.drivername))
+ASYNC_SQLALCHEMY_DATABASE_URL = DATABASE_URL.set(drivername=ASYNC_DRIVERS.get(BACKEND, DATABASE_URL.drivername))
+
+# Azure Database for MySQL へはSSL（証明書の検証あり）で接続する
+USE_MYSQL_SSL = BACKEND == "mysql"
+
+# コネクションプール設定（毎回のTLSハンドシェイクを避けるため接続を使い回す）
+POOL_OPTIONS = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+    "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+}
 
-# エンジンの作成
+# エンジンの作成（同期エンジンはマイグレーションやバッチスクリプト用）
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
     connect_args={
@@ -28,15 +57,38 @@ engine = create_engine(
             "ca": SSL_CA_PATH,
             "ssl_mode": "VERIFY_IDENTITY"
         }
-    }
+    } if USE_MYSQL_SSL else {},
+    **POOL_OPTIONS
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# 非同期エンジン（APIのリクエスト処理用）
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL,
+    poolclass=InstrumentedAsyncQueuePool,
+    **POOL_OPTIONS
+)
+
+
+if USE_MYSQL_SSL:
+    @event.listens_for(async_engine.sync_engine, "do_connect")
+    def _set_ssl_context(dialect, conn_rec, cargs, cparams):
+        # aiomysqlはSSLContextを受け取るため、接続時に証明書を読み込む（VERIFY_IDENTITY相当）
+        cparams["ssl"] = ssl.create_default_context(cafile=SSL_CA_PATH)
+
+
+# コミット後に属性を読んでも追加のクエリが走らないよう expire_on_commit=False にする
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+async def get_db():
+    # リクエストの最後に1回だけコミットし、例外のときはロールバックする
+    async with AsyncSessionLocal() as db:
+        async with unit_of_work(db):
+            yield db
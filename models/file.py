@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime, ForeignKey
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -9,6 +9,10 @@ class File(Base):
     id = Column(Integer, primary_key=True, index=True)
     knowledge_id = Column(Integer, ForeignKey("knowledges.id"))
     file_name = Column(String(255))
+    content_type = Column(String(255), nullable=True)
+    size = Column(BigInteger, nullable=True)  # バイト数
+    sha256 = Column(String(64), ForeignKey("blobs.sha256"), nullable=True, index=True)  # 本体（blobs）への参照
+    storage_key = Column(String(255), nullable=True)  # Blobストア上のキー（本体はDBに保存しない）
     uploaded_at = Column(DateTime, default=datetime.utcnow)
 
     # リレーションシップ
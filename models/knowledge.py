@@ -13,6 +13,8 @@ class Knowledge(Base):
     description = Column(Text)
     category = Column(String(100), nullable=True)
     views = Column(Integer, default=0)
+    comment_count = Column(Integer, default=0, server_default="0", nullable=False)  # commentsの件数（非正規化）
+    file_count = Column(Integer, default=0, server_default="0", nullable=False)  # filesの件数（非正規化）
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     author_id = Column(Integer, ForeignKey("users.id"))
@@ -26,4 +28,8 @@ class Knowledge(Base):
     # インデックス
     __table_args__ = (
         Index('ix_knowledges_category', 'category'),
+        # 一覧のキーセットページング用 (created_at DESC, id DESC)
+        Index('ix_knowledges_created_at_id', 'created_at', 'id'),
+        # エクスポートの差分取得用 (updated_at, id)
+        Index('ix_knowledges_updated_at_id', 'updated_at', 'id'),
     ) 
\ No newline at end of file
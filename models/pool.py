@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class PoolMetrics:
+    """コネクションプールの取得待ち時間・オーバーフローなどの統計"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_wait_seconds_total = 0.0
+        self.checkout_wait_seconds_max = 0.0
+        self.overflow_events = 0
+        self.timeouts = 0
+
+    def record_checkout(self, wait_seconds: float, overflowed: bool) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.checkout_wait_seconds_total += wait_seconds
+            self.checkout_wait_seconds_max = max(self.checkout_wait_seconds_max, wait_seconds)
+            if overflowed:
+                self.overflow_events += 1
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def stats(self, pool: "InstrumentedAsyncQueuePool") -> Dict[str, float]:
+        with self._lock:
+            return {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "checkouts": self.checkouts,
+                "checkout_wait_seconds_total": self.checkout_wait_seconds_total,
+                "checkout_wait_seconds_avg": (
+                    self.checkout_wait_seconds_total / self.checkouts if self.checkouts else 0.0
+                ),
+                "checkout_wait_seconds_max": self.checkout_wait_seconds_max,
+                "overflow_events": self.overflow_events,
+                "timeouts": self.timeouts,
+            }
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """プールからの接続取得にかかった時間とオーバーフローを記録するプール"""
+
+    metrics = PoolMetrics()
+
+    def _do_get(self):
+        overflow_before = self.overflow()
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record_timeout()
+            raise
+        overflow_after = self.overflow()
+        self.metrics.record_checkout(
+            time.perf_counter() - start,
+            overflowed=overflow_after > 0 and overflow_after > overflow_before,
+        )
+        return connection
+
+
+async def warm_pool(engine: AsyncEngine, connections: int) -> int:
+    """
+    起動時にプールへ接続を作っておく（TLSハンドシェイクを最初のリクエストで払わないため）
+
+    Returns:
+        int: 作成できた接続数
+    """
+    async def open_connection():
+        return await engine.connect()
+
+    results = await asyncio.gather(
+        *(open_connection() for _ in range(connections)),
+        return_exceptions=True,
+    )
+    opened = [c for c in results if not isinstance(c, BaseException)]
+    for connection in opened:
+        await connection.close()
+    for error in results:
+        if isinstance(error, BaseException):
+            print(f"❌ コネクションプールのウォームアップに失敗しました: {str(error)}")
+            break
+    return len(opened)
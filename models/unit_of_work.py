@@ -0,0 +1,124 @@
+import threading
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+# session.info に保存するキー
+_CALLBACKS_KEY = "after_commit_callbacks"
+_COMMITS_KEY = "commit_count"
+_WRITES_KEY = "has_writes"
+
+
+class UnitOfWorkMetrics:
+    """リクエストごとのコミット数・ロールバック数の統計"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.commits = 0
+        self.rollbacks = 0
+        self.multi_commit_requests = 0
+        self.commits_per_request: Counter = Counter()
+
+    def record(self, commits: int, rolled_back: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            self.commits += commits
+            if rolled_back:
+                self.rollbacks += 1
+            if commits > 1:
+                self.multi_commit_requests += 1
+            self.commits_per_request[commits] += 1
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "commits": self.commits,
+                "rollbacks": self.rollbacks,
+                "commits_per_request_avg": self.commits / self.requests if self.requests else 0.0,
+                "multi_commit_requests": self.multi_commit_requests,
+                "commits_per_request": {str(k): v for k, v in sorted(self.commits_per_request.items())},
+            }
+
+
+# アプリ全体で共有する統計
+unit_of_work_metrics = UnitOfWorkMetrics()
+
+
+def after_commit(db: AsyncSession, callback: Callable[[], None]) -> None:
+    """
+    現在のトランザクションがコミットされた後に callback を呼ぶ（キャッシュの更新などに使う）
+
+    ロールバックされた場合は呼ばずに破棄する。
+    """
+    db.sync_session.info.setdefault(_CALLBACKS_KEY, []).append(callback)
+
+
+def commit_count(db: AsyncSession) -> int:
+    """このセッションでコミットした回数"""
+    return db.sync_session.info.get(_COMMITS_KEY, 0)
+
+
+def has_writes(db: AsyncSession) -> bool:
+    """現在のトランザクションで書き込み（flush・INSERT/UPDATE/DELETE）をしたか、未反映の変更があるか"""
+    return bool(db.sync_session.info.get(_WRITES_KEY) or db.new or db.dirty or db.deleted)
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_flushed(session: Session, flush_context) -> None:
+    session.info[_WRITES_KEY] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_dml(orm_execute_state) -> None:
+    # db.execute(insert(...)) や相対 UPDATE など、flush を通らない書き込み
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[_WRITES_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session: Session) -> None:
+    # セーブポイントの解放（begin_nested）でも呼ばれるが、外側のトランザクションはまだコミットされていない
+    if session.in_nested_transaction():
+        return
+    session.info[_COMMITS_KEY] = session.info.get(_COMMITS_KEY, 0) + 1
+    session.info.pop(_WRITES_KEY, None)
+    callbacks = session.info.pop(_CALLBACKS_KEY, [])
+    for callback in callbacks:
+        callback()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_commit(session: Session) -> None:
+    # セーブポイントまでのロールバックでは、外側のトランザクションの書き込みやコールバックは残る
+    if session.in_nested_transaction():
+        return
+    session.info.pop(_CALLBACKS_KEY, None)
+    session.info.pop(_WRITES_KEY, None)
+
+
+@asynccontextmanager
+async def unit_of_work(db: AsyncSession) -> AsyncIterator[AsyncSession]:
+    """
+    1リクエストを1トランザクションとして扱う
+
+    処理中はコミットせず、正常に終わったら最後に1回だけ（flushしてから）コミットする。
+    読み取りだけのリクエストはコミットせず、そのままセッションを閉じる（COMMIT の往復を省く）。
+    例外（HTTPExceptionを含む）で終わった場合はロールバックする。
+    """
+    rolled_back = False
+    try:
+        yield db
+        if db.in_transaction() and has_writes(db):
+            await db.commit()
+    except BaseException:
+        rolled_back = True
+        await db.rollback()
+        raise
+    finally:
+        unit_of_work_metrics.record(commit_count(db), rolled_back)
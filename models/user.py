@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, LargeBinary
+from sqlalchemy import Column, Integer, String, Boolean, DateTime
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -16,11 +16,13 @@ class User(Base):
     points = Column(Integer, default=0)
     current_xp = Column(Integer, default=0)
     experience_points = Column(Integer, default=0)
+    activity_count = Column(Integer, default=0, server_default="0", nullable=False, index=True)  # user_activitiesの件数（非正規化）
     is_first_login = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    avatar_data = Column(LargeBinary, nullable=True)
+    # 画像本体は user_avatars に保存し、ここには小さなメタデータだけを持つ
     avatar_content_type = Column(String(50), nullable=True)  # 画像のMIMEタイプを保存
+    avatar_etag = Column(String(64), nullable=True)  # 画像のSHA-256（URLのバージョンとETagに使う）
     department = Column(String(100), nullable=True)
     avatar_url = Column(String(255), nullable=True)
 
@@ -37,8 +39,28 @@ class User(Base):
         ユーザーのアバター画像のURLを返す
         画像が設定されていない場合はNoneを返す
         """
-        if self.avatar_data is None:
-            return None
-        return f"/profile/{self.id}/avatar"
+        return build_avatar_url(self.id, self.avatar_etag)
+
+    @property
+    def small_avatar_url(self) -> str | None:
+        """一覧表示用（縮小版）のアバター画像のURL"""
+        return build_avatar_url(self.id, self.avatar_etag, "small")
+
+
+def build_avatar_url(user_id: int, avatar_etag: str | None, size: str | None = None) -> str | None:
+    """
+    アバター画像のURLを作る
+
+    画像が変わるとURLも変わるよう、ハッシュの先頭をバージョンとして付ける
+    （ブラウザやCDNに長期間キャッシュさせるため）。
+    """
+    if avatar_etag is None:
+        return None
+    url = f"/profile/{user_id}/avatar?v={avatar_version(avatar_etag)}"
+    if size:
+        url += f"&size={size}"
+    return url
 
 
+def avatar_version(avatar_etag: str) -> str:
+    return avatar_etag[:16]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -13,4 +13,10 @@ class UserActivity(Base):
     timestamp = Column(DateTime, default=datetime.utcnow)
 
     # リレーションシップ
-    user = relationship("User", back_populates="activities") 
\ No newline at end of file
+    user = relationship("User", back_populates="activities")
+
+    # インデックス
+    __table_args__ = (
+        # エクスポートの差分取得用 (timestamp, id)
+        Index('ix_user_activities_timestamp_id', 'timestamp', 'id'),
+    )
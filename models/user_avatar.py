@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, LargeBinary
+from datetime import datetime
+from .database import Base
+
+class UserAvatar(Base):
+    """アバター画像の本体（original）と、アップロード時に作る縮小版（small / medium）"""
+    __tablename__ = "user_avatars"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    variant = Column(String(16), primary_key=True)  # "original", "small", "medium"
+    content_type = Column(String(50))
+    data = Column(LargeBinary(length=16 * 1024 * 1024))
+    etag = Column(String(64))  # 画像のSHA-256
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,7 +1,8 @@
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, status, Form
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import EmailStr
 
 from models.database import get_db
@@ -9,7 +10,8 @@ from models.user import User
 from models.knowledge import Knowledge
 from models.comment import Comment
 from core.security import (
-    verify_password,
+    CurrentUser,
+    verify_password_async,
     create_access_token,
     get_current_user
 )
@@ -35,11 +37,11 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 @router.post("/login")
 async def login(
     form_data: OAuth2EmailRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     print("ログイン試行:", form_data.username)  # emailが入る
 
-    user = db.query(User).filter(User.email == form_data.username).first()
+    user = (await db.execute(select(User).where(User.email == form_data.username))).scalar_one_or_none()
 
     if not user:
         print("ユーザーが存在しません")
@@ -48,7 +50,8 @@ async def login(
             detail="メールアドレスまたはパスワードが正しくありません",
         )
 
-    if not verify_password(form_data.password, user.password_hash):
+    # bcryptの照合はスレッドプールで行う（混雑時は503）
+    if not await verify_password_async(form_data.password, user.password_hash):
         print("パスワードが一致しません")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -61,17 +64,18 @@ async def login(
 
 @router.get("/me")
 async def get_profile(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     # ユーザーの最新のナレッジを取得
     recent_knowledge = (
-        db.query(Knowledge)
-        .filter(Knowledge.author_id == current_user.id)
-        .order_by(Knowledge.created_at.desc())
-        .limit(5)
-        .all()
-    )
+        await db.execute(
+            select(Knowledge)
+            .where(Knowledge.author_id == current_user.id)
+            .order_by(Knowledge.created_at.desc())
+            .limit(5)
+        )
+    ).scalars().all()
 
     # アクティビティリストの作成
     activities = []
@@ -99,6 +103,6 @@ async def get_profile(
         "department": current_user.department,
         "level": current_user.level,
         "currentXp": current_user.current_xp,
-        "avatar": current_user.avatar_data,
+        "avatar": current_user.avatar_url,
         "activity": activities
     }
\ No newline at end of file
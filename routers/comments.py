@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from datetime import datetime
 
@@ -7,7 +8,13 @@ from models.database import get_db
 from models.user import User
 from models.knowledge import Knowledge
 from models.comment import Comment
-from core.security import get_current_user
+from models.unit_of_work import after_commit
+from core.security import CurrentUser, get_current_user
+from utils.conditional import is_not_modified, make_etag, not_modified, set_validators
+from utils.knowledge_counts import adjust_knowledge_counts
+from utils.response_cache import response_cache
+from utils.comments import fetch_comments
+from utils.pagination import MAX_LIMIT, NEXT_CURSOR_HEADER, next_cursor
 from pydantic import BaseModel
 from fastapi import Path
 from typing import Optional, List
@@ -32,10 +39,10 @@ class CommentResponse(BaseModel):
 async def create_comment(
     knowledge_id: int = Path(..., description="コメント対象のナレッジID"),
     comment: CommentCreate = Body(..., description="コメントの内容"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    knowledge = db.query(Knowledge).filter(Knowledge.id == knowledge_id).first()
+    knowledge = await db.get(Knowledge, knowledge_id)
     if not knowledge:
         raise HTTPException(status_code=404, detail="ナレッジが見つかりません")
 
@@ -46,15 +53,17 @@ async def create_comment(
     )
 
     db.add(new_comment)
-    db.commit()
-    db.refresh(new_comment)
+    await adjust_knowledge_counts(db, knowledge_id, comments=1)
+    # IDと投稿日時を得るためにflushだけ行う（コミットはリクエストの最後）
+    await db.flush()
+    after_commit(db, lambda: response_cache.invalidate("popular"))
 
     return CommentResponse(
         id=new_comment.id,
         content=new_comment.content,
         author_id=current_user.id,
         author_name=current_user.username,
-        avatar_url=current_user.avatar_url,
+        avatar_url=current_user.small_avatar_url,
         created_at=new_comment.created_at
     )
 
@@ -62,12 +71,36 @@ async def create_comment(
 @router.get("/", response_model=List[CommentResponse])
 async def get_comments(
     knowledge_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=MAX_LIMIT)
 ):
-    # authorをeager loadして取得
-    comments = db.query(Comment).options(
-        joinedload(Comment.author)
-    ).filter(Comment.knowledge_id == knowledge_id).order_by(Comment.created_at.asc()).all()
+    # コメントの件数・最新の投稿日時・投稿者の更新日時が変わっていなければ304を返す
+    version = (
+        await db.execute(
+            select(
+                func.count(Comment.id),
+                func.max(Comment.created_at),
+                func.max(User.updated_at),
+            )
+            .outerjoin(User, User.id == Comment.author_id)
+            .where(Comment.knowledge_id == knowledge_id)
+        )
+    ).one()
+    etag = make_etag("comments", knowledge_id, *version)
+    timestamps = [t for t in version[1:] if t is not None]
+    last_modified = max(timestamps) if timestamps else None
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    set_validators(response, etag, last_modified)
+
+    # 古い順に limit 件ずつ取得し、authorはまとめて読み込む
+    comments = await fetch_comments(db, knowledge_id, cursor, limit)
+    cursor_for_next_page = next_cursor(comments, limit)
+    if cursor_for_next_page:
+        response.headers[NEXT_CURSOR_HEADER] = cursor_for_next_page
 
     return [
         CommentResponse(
@@ -76,7 +109,7 @@ async def get_comments(
             author_id=comment.author_id,
             # authorがNoneの場合のフォールバック
             author_name=comment.author.username if comment.author else "削除されたユーザー",
-            avatar_url=comment.author.avatar_url if comment.author else None,
+            avatar_url=comment.author.small_avatar_url if comment.author else None,
             created_at=comment.created_at
         )
         for comment in comments
@@ -87,10 +120,14 @@ async def get_comments(
 async def delete_comment(
     knowledge_id: int,
     comment_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    comment = db.query(Comment).filter(Comment.id == comment_id, Comment.knowledge_id == knowledge_id).first()
+    comment = (
+        await db.execute(
+            select(Comment).where(Comment.id == comment_id, Comment.knowledge_id == knowledge_id)
+        )
+    ).scalar_one_or_none()
 
     if not comment:
         raise HTTPException(status_code=404, detail="コメントが見つかりません")
@@ -98,7 +135,8 @@ async def delete_comment(
     if comment.author_id != current_user.id:
         raise HTTPException(status_code=403, detail="コメントを削除する権限がありません")
 
-    db.delete(comment)
-    db.commit()
+    await db.delete(comment)
+    await adjust_knowledge_counts(db, knowledge_id, comments=-1)
+    after_commit(db, lambda: response_cache.invalidate("popular"))
 
     return {"detail": "コメントが削除されました"}
@@ -0,0 +1,76 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.database import get_db
+from core.config import settings
+from core.security import CurrentUser, get_current_user, is_allowed_email
+from utils.export import (
+    EXPORT_FORMATS,
+    EXPORT_TABLES,
+    columns,
+    export_cutoff,
+    export_query,
+    format_header,
+    format_rows,
+    format_watermark,
+    next_watermark,
+    parse_watermark,
+    watermark_query,
+)
+
+router = APIRouter()
+
+# 次回の since に渡すウォーターマーク
+WATERMARK_HEADER = "X-Export-Watermark"
+
+
+async def require_export_permission(current_user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
+    """EXPORT_ALLOWED_EMAILS に含まれるユーザーだけに許可する（全ユーザーの活動などを含むため）"""
+    if not is_allowed_email(current_user.email, settings.EXPORT_ALLOWED_EMAILS):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="エクスポートの権限がありません")
+    return current_user
+
+
+@router.get("/{table}")
+async def export_table(
+    table: str,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    since: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(require_export_permission)
+):
+    """
+    テーブルをNDJSON/CSVでストリーミング出力する（分析用。EXPORT_ALLOWED_EMAILS のユーザーのみ）
+
+    レスポンスヘッダー X-Export-Watermark の値（"日時|ID"）を次回の since に渡すと、
+    前回出力した行より後の差分だけを取得できる。
+    """
+    if table not in EXPORT_TABLES:
+        raise HTTPException(status_code=404, detail="エクスポートできないテーブルです")
+    try:
+        since_watermark = parse_watermark(since) if since else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="since が正しくありません")
+
+    until = (await db.execute(watermark_query(table, export_cutoff()))).first()
+    watermark = next_watermark(since_watermark, until)
+    names = columns(table)
+    # レスポンスの送信中はリクエストのセッションが閉じられているため、専用の接続で読み出す
+    bind = db.bind
+
+    async def stream():
+        yield format_header(format, names)
+        async with bind.connect() as connection:
+            result = await connection.stream(export_query(table, since_watermark, until))
+            async for rows in result.partitions():
+                yield format_rows(format, names, rows)
+
+    headers = {
+        "Content-Disposition": f'attachment; filename="{table}.{format}"',
+    }
+    if watermark is not None:
+        headers[WATERMARK_HEADER] = format_watermark(watermark)
+    return StreamingResponse(stream(), media_type=EXPORT_FORMATS[format], headers=headers)
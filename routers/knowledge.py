@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, selectinload
+from sqlalchemy import func, insert, select, true
+from typing import List, Optional, Tuple
 from datetime import datetime
 
 from models.database import get_db
@@ -8,8 +10,22 @@ from models.user import User
 from models.knowledge import Knowledge
 from models.file import File as FileModel
 from models.comment import Comment
-from core.security import get_current_user
+from models.collection_version import CollectionVersion
+from models.unit_of_work import after_commit
+from core.config import settings
+from core.security import CurrentUser, get_current_user, is_allowed_email
+from utils.attachments import release_attachments, retain_blobs, store_attachment
+from utils.blob_store import get_blob_store
+from utils.bulk_import import BulkImporter
+from utils.collection_version import KNOWLEDGE_LIST, bump_collection_version
+from utils.comments import fetch_comments
+from utils.conditional import is_not_modified, make_etag, not_modified, set_validators
+from utils.download import blob_response
 from utils.experience import add_experience
+from utils.search import search_index
+from utils.view_counter import view_counter
+from utils.response_cache import response_cache
+from utils.pagination import MAX_LIMIT, MAX_OFFSET, NEXT_CURSOR_HEADER, decode_cursor, next_cursor
 
 router = APIRouter()
 
@@ -20,134 +36,279 @@ async def create_knowledge(
     target: str = Form(...),
     description: str = Form(...),
     category: Optional[str] = Form(None),
-    files: Optional[List[UploadFile]] = File(None),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    # Optional[List[UploadFile]] は fastapi 0.110.0 でリストとして解釈されないため空リストを既定値にする
+    files: List[UploadFile] = File([]),
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    try:
-        if current_user is None:
-            # 認証されていないときのテスト用デフォルトレスポンス
-            return {
-                "id": 1,
-                "title": title,
-                "method": method,
-                "target": target,
-                "description": description,
-                "category": category,
-                "views": 0,
-                "createdAt": datetime.now().strftime("%Y年%m月%d日"),
-                "updatedAt": datetime.now().strftime("%Y年%m月%d日"),
+    # 添付ファイルの本体を先に保存する（Blobの登録は別の接続で即コミットされるため、
+    # このリクエストのトランザクションで書き込みを始める前に済ませる）
+    files = [file for file in files if file.filename]
+    store = get_blob_store()
+    stored_files = [(file.filename, await store_attachment(db.bind, store, file)) for file in files]
+
+    # ナレッジの作成（IDを得るためにflushだけ行い、コミットはリクエストの最後に1回だけ行う）
+    knowledge = Knowledge(
+        title=title,
+        method=method,
+        target=target,
+        description=description,
+        category=category,
+        author_id=current_user.id,
+        file_count=len(stored_files)
+    )
+    db.add(knowledge)
+    await db.flush()
+
+    # 添付ファイルの行はまとめて INSERT し、同じ内容は共有するBlobの参照数を増やす
+    if stored_files:
+        await db.execute(
+            insert(FileModel),
+            [
+                {
+                    "knowledge_id": knowledge.id,
+                    "file_name": file_name,
+                    "content_type": stored.content_type,
+                    "size": stored.size,
+                    "sha256": stored.sha256,
+                    "storage_key": stored.key,
+                }
+                for file_name, stored in stored_files
+            ],
+        )
+        await retain_blobs(db, [stored.sha256 for _, stored in stored_files])
+
+    # 経験値を追加（台帳への記録もこのトランザクションに含める）
+    experience_result = await add_experience(current_user.id, 10, db, action="create_knowledge")
+
+    def refresh_caches() -> None:
+        search_index.add(knowledge)
+        response_cache.invalidate("popular")
+
+    after_commit(db, refresh_caches)
+
+    return {
+        "id": knowledge.id,
+        "title": knowledge.title,
+        "method": knowledge.method,
+        "target": knowledge.target,
+        "description": knowledge.description,
+        "category": knowledge.category,
+        "views": knowledge.views,
+        "createdAt": knowledge.created_at.strftime("%Y年%m月%d日"),
+        "updatedAt": knowledge.updated_at.strftime("%Y年%m月%d日"),
+        "author": {
+            "id": current_user.id,
+            "name": current_user.username,
+            "avatarUrl": current_user.avatar_url,
+            "department": current_user.department
+        },
+        "stats": {
+            "commentCount": 0,
+            "fileCount": len(stored_files)
+        },
+        "experience": {
+            "level_up": experience_result["level_up"],
+            "before_level": experience_result["before_level"],
+            "before_xp": experience_result["before_xp"],
+            "after_level": experience_result["after_level"],
+            "after_xp": experience_result["after_xp"],
+            "required_xp": experience_result["required_xp"]
+        }
+    }
+
+async def knowledge_version(db: AsyncSession, knowledge_id: int) -> Tuple[str, Optional[datetime]]:
+    """
+    ナレッジ詳細の版を表す ETag と Last-Modified を返す
+
+    本文の更新日時・著者の更新日時と、コメントの件数・最新の投稿日時・
+    コメント投稿者の更新日時から作る。存在しない場合は404。
+    閲覧数は閲覧のたびに変わるので版に含めない（弱いETagなので、閲覧数だけが違う本文は同じ版とみなす）。
+    """
+    comment_author = aliased(User)
+    comment_stats = (
+        select(
+            func.count(Comment.id).label("comment_count"),
+            func.max(Comment.created_at).label("latest_comment_at"),
+            func.max(comment_author.updated_at).label("comment_authors_updated_at"),
+        )
+        .outerjoin(comment_author, comment_author.id == Comment.author_id)
+        .where(Comment.knowledge_id == knowledge_id)
+        .subquery()
+    )
+    row = (
+        await db.execute(
+            select(
+                Knowledge.updated_at,
+                User.updated_at.label("author_updated_at"),
+                comment_stats.c.comment_count,
+                comment_stats.c.latest_comment_at,
+                comment_stats.c.comment_authors_updated_at,
+            )
+            .outerjoin(User, User.id == Knowledge.author_id)
+            .join(comment_stats, true())
+            .where(Knowledge.id == knowledge_id)
+        )
+    ).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="ナレッジが見つかりません")
+
+    timestamps = [
+        t for t in (
+            row.updated_at, row.author_updated_at, row.latest_comment_at, row.comment_authors_updated_at
+        ) if t is not None
+    ]
+    last_modified = max(timestamps) if timestamps else None
+    return make_etag("knowledge", knowledge_id, *row), last_modified
+
+
+async def knowledge_collection_version(db: AsyncSession) -> Tuple[str, Optional[datetime]]:
+    """
+    ナレッジ一覧の版（コレクションバージョン）を表す ETag と Last-Modified を返す
+
+    MAX(id)・MAX(updated_at)（どちらもインデックスだけで求まる）と collection_versions の版から作る。
+    追加は MAX(id) で、更新・削除・一括登録・著者名やアバターの変更は版の加算で分かる
+    （MySQLの DATETIME は秒単位なので、同じ秒の更新は MAX(updated_at) だけでは区別できない）。
+    閲覧数は版に含めないので、一覧の閲覧数はほかの変更があるまで古いことがある。
+    """
+    is_knowledge_list = CollectionVersion.name == KNOWLEDGE_LIST
+    row = (
+        await db.execute(
+            select(
+                func.max(Knowledge.id),
+                func.max(Knowledge.updated_at),
+                select(CollectionVersion.version).where(is_knowledge_list).scalar_subquery(),
+                select(CollectionVersion.updated_at).where(is_knowledge_list).scalar_subquery(),
+            )
+        )
+    ).one()
+    timestamps = [t for t in (row[1], row[3]) if t is not None]
+    last_modified = max(timestamps) if timestamps else None
+    return make_etag("knowledges", *row), last_modified
+
+
+async def require_bulk_import_permission(current_user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
+    """BULK_IMPORT_ALLOWED_EMAILS に含まれるユーザーだけに許可する（ほかのユーザー名義で登録できるため）"""
+    if not is_allowed_email(current_user.email, settings.BULK_IMPORT_ALLOWED_EMAILS):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="一括登録の権限がありません")
+    return current_user
+
+
+@router.post("/bulk")
+async def bulk_import_knowledge(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(require_bulk_import_permission)
+):
+    """
+    NDJSON（1行1件のJSON）でナレッジをまとめて登録する（移行用。BULK_IMPORT_ALLOWED_EMAILS のユーザーのみ）
+
+    各行は title, method, target（必須）と description, category, author_email, created_at。
+    author_email を省略した行はログインユーザーの投稿になる。
+    ボディは受信しながら処理するので、件数が多くてもメモリ使用量は増えない。
+    """
+    importer = BulkImporter(db, default_author_id=current_user.id)
+    result = await importer.run(request.stream())
+
+    if importer.inserted:
+        await bump_collection_version(db, KNOWLEDGE_LIST)
+        search_index.invalidate()
+        response_cache.invalidate("popular")
+    return result
+
+
+# 閲覧数順のナレッジ取得を追加　0408
+# 著者を1回のクエリでまとめて取得する（ファイル数・コメント数は knowledges の非正規化カラム）
+# （/{knowledge_id} より先に定義しないとパスが衝突する）
+@router.get("/popular")
+async def get_popular_knowledge(
+    limit: int = 10,
+    db: AsyncSession = Depends(get_db)
+):
+    # ダッシュボードのたびに集計しないよう、結果をキャッシュする（作成・更新・削除で無効化）
+    async def compute():
+        rows = (
+            await db.execute(
+                select(Knowledge, User)
+                .join(User, User.id == Knowledge.author_id)
+                .order_by(Knowledge.views.desc())
+                .limit(limit)
+            )
+        ).all()
+
+        result = []
+        for k, author in rows:
+            result.append({
+                "id": k.id,
+                "title": k.title,
+                "description": k.description,
+                "method": k.method,
+                "target": k.target,
+                "category": k.category,
+                "views": k.views,
+                "createdAt": k.created_at.strftime("%Y年%m月%d日"),
+                "updatedAt": k.updated_at.strftime("%Y年%m月%d日"),
                 "author": {
-                    "id": 1,
-                    "name": "テストユーザー",
-                    "avatarUrl": None,
-                    "department": "開発部"
+                    "id": author.id,
+                    "name": author.username,
+                    "avatarUrl": author.small_avatar_url,
+                    "department": author.department
                 },
                 "stats": {
-                    "commentCount": 0,
-                    "fileCount": 0
+                    "commentCount": k.comment_count,
+                    "fileCount": k.file_count
                 }
-            }
+            })
 
-        # ナレッジの作成
-        knowledge = Knowledge(
-            title=title,
-            method=method,
-            target=target,
-            description=description,
-            category=category,
-            author_id=current_user.id
-        )
-        db.add(knowledge)
-        db.commit()
-        db.refresh(knowledge)
-        
-        # ファイルのアップロード処理
-        if files:
-            for file in files:
-                file_content = await file.read()
-                db_file = FileModel(
-                    knowledge_id=knowledge.id,
-                    file_name=file.filename,
-                    content_type=file.content_type,
-                    file_data=file_content
-                )
-                db.add(db_file)
-        
-        db.commit()
-
-        # 経験値を追加
-        experience_result = add_experience(current_user, 10, db)
-        
         return {
-            "id": knowledge.id,
-            "title": knowledge.title,
-            "method": knowledge.method,
-            "target": knowledge.target,
-            "description": knowledge.description,
-            "category": knowledge.category,
-            "views": knowledge.views,
-            "createdAt": knowledge.created_at.strftime("%Y年%m月%d日"),
-            "updatedAt": knowledge.updated_at.strftime("%Y年%m月%d日"),
-            "author": {
-                "id": current_user.id,
-                "name": current_user.username,
-                "avatarUrl": current_user.avatar_url,
-                "department": current_user.department
-            },
-            "stats": {
-                "commentCount": 0,
-                "fileCount": len(files) if files else 0
-            },
-            "experience": {
-                "level_up": experience_result["level_up"],
-                "before_level": experience_result["before_level"],
-                "before_xp": experience_result["before_xp"],
-                "after_level": experience_result["after_level"],
-                "after_xp": experience_result["after_xp"],
-                "required_xp": experience_result["required_xp"]
-            }
+            "total": len(result),
+            "items": result
         }
 
-    except Exception as e:
-        print(f"ナレッジ作成エラー: {str(e)}")
-        return {
-            "id": 1,
-            "title": title,
-            "method": method,
-            "target": target,
-            "description": description,
-            "category": category,
-            "views": 0,
-            "createdAt": datetime.now().strftime("%Y年%m月%d日"),
-            "updatedAt": datetime.now().strftime("%Y年%m月%d日"),
-            "author": {
-                "id": 1,
-                "name": "テストユーザー",
-                "avatarUrl": None,
-                "department": "開発部"
-            },
-            "stats": {
-                "commentCount": 0,
-                "fileCount": 0
-            }
-        }
+    return await response_cache.get_or_compute(
+        "popular", {"limit": limit}, compute, ttl=settings.RESPONSE_CACHE_TTL_SECONDS
+    )
 
 @router.get("/{knowledge_id}")
 async def get_knowledge_detail(
     knowledge_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user) ,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user) ,
+    comment_cursor: Optional[str] = None,
+    comment_limit: int = Query(20, ge=1, le=MAX_LIMIT),
 ):
-    knowledge = db.query(Knowledge).filter(Knowledge.id == knowledge_id).first()
+    # コメントや著者を読み込む前に、版（更新日時・コメント）だけを取得して304を判定する
+    etag, last_modified = await knowledge_version(db, knowledge_id)
+    if is_not_modified(request, etag, last_modified):
+        # 304でも閲覧として数える
+        view_counter.increment(knowledge_id)
+        return not_modified(etag, last_modified)
+    set_validators(response, etag, last_modified)
+
+    # 著者・ファイルはまとめて読み込む（コメントは件数が多くなりうるので下でページングする）
+    knowledge = (
+        await db.execute(
+            select(Knowledge)
+            .options(
+                selectinload(Knowledge.author),
+                selectinload(Knowledge.files),
+            )
+            .where(Knowledge.id == knowledge_id)
+        )
+    ).scalar_one_or_none()
     if not knowledge:
         raise HTTPException(status_code=404, detail="ナレッジが見つかりません")
 
-    # 閲覧数をインクリメント
-    knowledge.views += 1
-    db.commit()
+    # 閲覧数はバッファに加算し、定期的にまとめてDBへ反映する
+    view_counter.increment(knowledge.id)
+    views = knowledge.views or 0
+    if settings.VIEW_COUNT_READ_YOUR_VIEWS:
+        views += view_counter.pending(knowledge.id)
     
-    # コメント一覧を取得
+    # コメントを古い順に comment_limit 件取得する（続きは nextCommentCursor で取得）
+    page = await fetch_comments(db, knowledge.id, comment_cursor, comment_limit)
     comments = [
         {
             "id": c.id,
@@ -155,12 +316,12 @@ async def get_knowledge_detail(
             "author": {
                 "id": c.author.id,
                 "name": c.author.username,
-                "avatarUrl": c.author.avatar_url,
+                "avatarUrl": c.author.small_avatar_url,
                 "department": c.author.department
             },
             "createdAt": c.created_at.strftime("%Y年%m月%d日")
         }
-        for c in knowledge.comments
+        for c in page
     ]
 
     return {
@@ -170,7 +331,7 @@ async def get_knowledge_detail(
         "target": knowledge.target,
         "description": knowledge.description,
         "category": knowledge.category,
-        "views": knowledge.views,
+        "views": views,
         "createdAt": knowledge.created_at.strftime("%Y年%m月%d日"),
         "updatedAt": knowledge.updated_at.strftime("%Y年%m月%d日"),
         "author": {
@@ -180,33 +341,102 @@ async def get_knowledge_detail(
             "department": knowledge.author.department
         },
         "stats": {
-            "commentCount": len(comments),
-            "fileCount": len(knowledge.files)
+            "commentCount": knowledge.comment_count,
+            "fileCount": knowledge.file_count
         },
-        "comments": comments
+        "files": [
+            {
+                "id": f.id,
+                "name": f.file_name,
+                "contentType": f.content_type,
+                "size": f.size,
+                "url": f"/knowledge/{knowledge.id}/files/{f.id}"
+            }
+            for f in knowledge.files
+        ],
+        "comments": comments,
+        "nextCommentCursor": next_cursor(page, comment_limit)
     }
 
 
+@router.get("/{knowledge_id}/files/{file_id}")
+async def download_knowledge_file(
+    knowledge_id: int,
+    file_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    # Range（途中からの再開）と ETag（内容のハッシュ）に対応してストリーミングで返す
+    db_file = await db.get(FileModel, file_id)
+    if not db_file or db_file.knowledge_id != knowledge_id or not db_file.storage_key:
+        raise HTTPException(status_code=404, detail="ファイルが見つかりません")
+
+    return blob_response(
+        request,
+        get_blob_store(),
+        key=db_file.storage_key,
+        size=db_file.size or 0,
+        etag=f'"{db_file.sha256}"',
+        content_type=db_file.content_type,
+        filename=db_file.file_name or f"file-{db_file.id}",
+    )
+
+
 @router.get("/")
 async def get_knowledge_list(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
     keyword: Optional[str] = None,
-    limit: int = 20,
-    offset: int = 0
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=MAX_LIMIT),
+    offset: int = Query(0, ge=0, le=MAX_OFFSET)
 ):
-    query = db.query(Knowledge)
+    # 一覧全体の版が変わっていなければ検索や著者の読み込みをせずに304を返す
+    etag, last_modified = await knowledge_collection_version(db)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    set_validators(response, etag, last_modified)
 
-    # タイトルでの部分一致検索
     if keyword:
-        query = query.filter(Knowledge.title.like(f"%{keyword}%"))
+        # 全文検索インデックスでスコア順に取得する（ページングはoffsetのみ）
+        await search_index.ensure_built(db)
+        hits, _ = search_index.search(keyword, limit=limit, offset=offset)
+        hit_ids = [knowledge_id for knowledge_id, _ in hits]
+        rows = (
+            await db.execute(
+                select(Knowledge)
+                .options(selectinload(Knowledge.author))
+                .where(Knowledge.id.in_(hit_ids))
+            )
+        ).scalars().all() if hit_ids else []
+        rows_by_id = {k.id: k for k in rows}
+        knowledges = [rows_by_id[i] for i in hit_ids if i in rows_by_id]
+    else:
+        query = select(Knowledge).options(selectinload(Knowledge.author))
 
-    knowledges = (
-        query.order_by(Knowledge.created_at.desc())
-        .offset(offset)
-        .limit(limit)
-        .all()
-    )
+        # カーソル指定時は (created_at, id) より古い行から取得する（キーセットページング）
+        if cursor:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+            query = query.where(
+                (Knowledge.created_at < cursor_created_at) |
+                ((Knowledge.created_at == cursor_created_at) & (Knowledge.id < cursor_id))
+            )
+        elif offset:
+            query = query.offset(offset)
+
+        knowledges = (
+            await db.execute(
+                query.order_by(Knowledge.created_at.desc(), Knowledge.id.desc())
+                .limit(limit)
+            )
+        ).scalars().all()
+
+        cursor_for_next_page = next_cursor(knowledges, limit)
+        if cursor_for_next_page:
+            response.headers[NEXT_CURSOR_HEADER] = cursor_for_next_page
 
     result = []
     for k in knowledges:
@@ -221,7 +451,7 @@ async def get_knowledge_list(
             "author": {
                 "id": k.author.id,
                 "name": k.author.username,
-                "avatarUrl": k.author.avatar_url
+                "avatarUrl": k.author.small_avatar_url
             }
         })
 
@@ -235,10 +465,10 @@ async def update_knowledge(
     target: str = Form(...),
     description: str = Form(...),
     category: Optional[str] = Form(None),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    knowledge = db.query(Knowledge).filter(Knowledge.id == knowledge_id).first()
+    knowledge = await db.get(Knowledge, knowledge_id)
 
     if not knowledge:
         raise HTTPException(status_code=404, detail="ナレッジが見つかりません")
@@ -251,73 +481,39 @@ async def update_knowledge(
     knowledge.description = description
     knowledge.category = category
     knowledge.updated_at = datetime.utcnow()
+    # 同じ秒に別の行が更新されると MAX(updated_at) は変わらないので、一覧の版も進める
+    await bump_collection_version(db, KNOWLEDGE_LIST)
 
-    db.commit()
-    db.refresh(knowledge)
+    def refresh_caches() -> None:
+        search_index.add(knowledge)
+        response_cache.invalidate("popular")
+
+    after_commit(db, refresh_caches)
 
     return {"message": "ナレッジを更新しました", "id": knowledge.id}
 
 @router.delete("/{knowledge_id}")
 async def delete_knowledge(
     knowledge_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    knowledge = db.query(Knowledge).filter(Knowledge.id == knowledge_id).first()
+    knowledge = await db.get(Knowledge, knowledge_id)
 
     if not knowledge:
         raise HTTPException(status_code=404, detail="ナレッジが見つかりません")
     if knowledge.author_id != current_user.id:
         raise HTTPException(status_code=403, detail="削除権限がありません")
 
-    db.delete(knowledge)
-    db.commit()
+    # 添付ファイルの本体は参照数を減らすだけにし、削除はスイーパーに任せる
+    await release_attachments(db, knowledge_id)
+    await db.delete(knowledge)
+    await bump_collection_version(db, KNOWLEDGE_LIST)
 
-    return {"message": "ナレッジを削除しました", "id": knowledge_id}
+    def refresh_caches() -> None:
+        search_index.remove(knowledge_id)
+        response_cache.invalidate("popular")
 
-# 閲覧数順のナレッジ取得を追加　0408
-@router.get("/popular")
-async def get_popular_knowledge(
-    limit: int = 10,
-    db: Session = Depends(get_db)
-):
-    
-    knowledge_list = (
-        db.query(Knowledge)
-        .order_by(Knowledge.views.desc())
-        .limit(limit)
-        .all()
-    )
-
-    result = []
-    for k in knowledge_list:
-        author = db.query(User).filter(User.id == k.author_id).first()
-        file_count = db.query(FileModel).filter(FileModel.knowledge_id == k.id).count()
-        comment_count = db.query(Comment).filter(Comment.knowledge_id == k.id).count()
-
-        result.append({
-            "id": k.id,
-            "title": k.title,
-            "description": k.description,
-            "method": k.method,
-            "target": k.target,
-            "category": k.category,
-            "views": k.views,
-            "createdAt": k.created_at.strftime("%Y年%m月%d日"),
-            "updatedAt": k.updated_at.strftime("%Y年%m月%d日"),
-            "author": {
-                "id": author.id,
-                "name": author.username,
-                "avatarUrl": author.avatar_url,
-                "department": author.department
-            },
-            "stats": {
-                "commentCount": comment_count,
-                "fileCount": file_count
-            }
-        })
+    after_commit(db, refresh_caches)
 
-    return {
-        "total": len(result),
-        "items": result
-    }
\ No newline at end of file
+    return {"message": "ナレッジを削除しました", "id": knowledge_id}
@@ -1,20 +1,32 @@
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Response
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from pydantic import BaseModel
 import os
 from sqlalchemy.sql import func
 
 from models.database import get_db
-from models.user import User
+from models.user import User, avatar_version
+from models.user_avatar import UserAvatar
 from models.profile import Profile
 from models.knowledge import Knowledge
 from models.comment import Comment
-from core.security import get_current_user, get_password_hash
+from models.unit_of_work import after_commit
+from core.security import CurrentUser, get_current_user, get_password_hash_async, principal_cache
+from utils.avatars import AVATAR_CONTENT_TYPES, AVATAR_RESPONSE_HEADERS, ORIGINAL, save_avatar, served_content_type
+from utils.collection_version import KNOWLEDGE_LIST, bump_collection_version
+from utils.conditional import etag_matches
+from utils.leaderboard import leaderboard
+from utils.level_curve import level_curve
+from utils.response_cache import response_cache
 
 router = APIRouter(prefix="/profile", tags=["profile"])
 
+# 認証なしで配信するアバター画像（User.avatar_url の /profile/{id}/avatar）
+avatar_router = APIRouter()
+
 class UserProfileUpdate(BaseModel):
     username: Optional[str] = None
     department: Optional[str] = None
@@ -22,95 +34,49 @@ class UserProfileUpdate(BaseModel):
     bio: Optional[str] = None
     phoneNumber: Optional[str] = None
 
-@router.get("/{user_id}")
-async def get_user_profile(
-    user_id: int,
-    db: Session = Depends(get_db)
-):
-    # ユーザー情報を取得
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="ユーザーが見つかりません"
-        )
-    
-    # ユーザーの最新のナレッジを取得
-    recent_knowledge = (
-        db.query(Knowledge)
-        .filter(Knowledge.author_id == user.id)
-        .order_by(Knowledge.created_at.desc())
-        .limit(5)
-        .all()
-    )
-
-    # アクティビティリストの作成
-    activities = []
-    for knowledge in recent_knowledge:
-        activities.append({
-            "id": knowledge.id,
-            "title": knowledge.title,
-            "category": knowledge.category,
-            "method": knowledge.method,
-            "target": knowledge.target,
-            "views": knowledge.views,
-            "createdAt": knowledge.created_at.strftime("%Y年%m月%d日"),
-            "author": {
-                "id": user.id,
-                "name": user.username,
-                "avatarUrl": user.avatar_url
-            }
-        })
-
-    return {
-        "id": user.id,
-        "email": user.email,
-        "name": user.username,
-        "department": user.department,
-        "level": user.level,
-        "currentXp": user.current_xp,
-        "avatar": user.avatar_data,
-        "activity": activities
-    }
-
 @router.get("/me")
 async def read_profile(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    # プロフィール情報を取得
-    profile = db.query(Profile).filter(Profile.user_id == current_user.id).first()
-    if not profile:
-        profile = Profile(user_id=current_user.id)
-        db.add(profile)
-        db.commit()
-        db.refresh(profile)
+    # プロフィール情報を取得（まだ作られていない場合は空の値を返す。作成は更新時に行う）
+    profile = (
+        await db.execute(select(Profile).where(Profile.user_id == current_user.id))
+    ).scalar_one_or_none() or Profile(user_id=current_user.id)
     
     # ナレッジ数を取得
-    knowledge_count = db.query(Knowledge).filter(
-        Knowledge.author_id == current_user.id
-    ).count()
+    knowledge_count = await db.scalar(
+        select(func.count(Knowledge.id)).where(Knowledge.author_id == current_user.id)
+    )
     
     # コメント数を取得
-    comment_count = db.query(Comment).filter(
-        Comment.author_id == current_user.id
-    ).count()
+    comment_count = await db.scalar(
+        select(func.count(Comment.id)).where(Comment.author_id == current_user.id)
+    )
     
     # 最近の活動を取得（最新5件のナレッジとコメント）
-    recent_knowledge = db.query(Knowledge).filter(
-        Knowledge.author_id == current_user.id
-    ).order_by(Knowledge.created_at.desc()).limit(5).all()
+    recent_knowledge = (
+        await db.execute(
+            select(Knowledge).where(
+                Knowledge.author_id == current_user.id
+            ).order_by(Knowledge.created_at.desc()).limit(5)
+        )
+    ).scalars().all()
     
-    recent_comments = db.query(Comment).filter(
-        Comment.author_id == current_user.id
-    ).order_by(Comment.created_at.desc()).limit(5).all()
+    recent_comments = (
+        await db.execute(
+            select(Comment).where(
+                Comment.author_id == current_user.id
+            ).order_by(Comment.created_at.desc()).limit(5)
+        )
+    ).scalars().all()
     
     return {
         "id": current_user.id,
         "name": current_user.username,
         "email": current_user.email,
         "department": current_user.department,
-        "hasAvatar": current_user.avatar_data is not None,
+        "hasAvatar": current_user.has_avatar,
         "experiencePoints": current_user.experience_points,
         "level": current_user.level,
         "bio": profile.bio,
@@ -141,32 +107,44 @@ async def read_profile(
 @router.put("/me")
 async def update_profile(
     profile_data: UserProfileUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
+    # 更新するのでORMのUserを取得する
+    user = await current_user.load(db)
+
     if profile_data.username is not None:
         # ユーザー名の重複チェック
-        existing_user = db.query(User).filter(
-            User.username == profile_data.username,
-            User.id != current_user.id
+        existing_user = (
+            await db.execute(
+                select(User.id).where(
+                    User.username == profile_data.username,
+                    User.id != user.id
+                )
+            )
         ).first()
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="このユーザー名は既に使用されています"
             )
-        current_user.username = profile_data.username
+        if profile_data.username != user.username:
+            # 著者名はナレッジ一覧にも表示される
+            await bump_collection_version(db, KNOWLEDGE_LIST)
+        user.username = profile_data.username
     
     if profile_data.department is not None:
-        current_user.department = profile_data.department
+        user.department = profile_data.department
     
     if profile_data.password is not None:
-        current_user.password_hash = get_password_hash(profile_data.password)
+        user.password_hash = await get_password_hash_async(profile_data.password)
     
     # プロフィール情報の更新
-    profile = db.query(Profile).filter(Profile.user_id == current_user.id).first()
+    profile = (
+        await db.execute(select(Profile).where(Profile.user_id == user.id))
+    ).scalar_one_or_none()
     if not profile:
-        profile = Profile(user_id=current_user.id)
+        profile = Profile(user_id=user.id)
         db.add(profile)
     
     if profile_data.bio is not None:
@@ -175,19 +153,25 @@ async def update_profile(
     if profile_data.phoneNumber is not None:
         profile.phone_number = profile_data.phoneNumber
     
-    current_user.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(current_user)
-    db.refresh(profile)
+    user.updated_at = datetime.utcnow()
+
+    def refresh_caches() -> None:
+        principal_cache.invalidate(user.email)
+        # リクエスト開始時に読んだ user のレベル・ポイントは古いことがあるので、表示名などだけを反映する
+        leaderboard.update_profile(user.id, user.username, user.department, user.small_avatar_url)
+        # 名前・所属・アバターはランキングと人気ナレッジにも表示される
+        response_cache.invalidate("ranking:*", "popular")
+
+    after_commit(db, refresh_caches)
     
     return {
-        "id": current_user.id,
-        "name": current_user.username,
-        "email": current_user.email,
-        "department": current_user.department,
-        "hasAvatar": current_user.avatar_data is not None,
-        "experiencePoints": current_user.experience_points,
-        "level": current_user.level,
+        "id": user.id,
+        "name": user.username,
+        "email": user.email,
+        "department": user.department,
+        "hasAvatar": user.avatar_etag is not None,
+        "experiencePoints": user.experience_points,
+        "level": user.level,
         "bio": profile.bio,
         "phoneNumber": profile.phone_number
     }
@@ -195,30 +179,38 @@ async def update_profile(
 @router.post("/me/avatar")
 async def update_avatar(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    # ファイルタイプの検証
-    if not file.content_type.startswith('image/'):
+    # ファイルタイプの検証（誰でも閲覧できるURLで配信するので、ラスター画像だけを受け付ける）
+    if file.content_type not in AVATAR_CONTENT_TYPES:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="File must be an image"
+            detail="File must be a PNG, JPEG, GIF or WebP image"
         )
     
     try:
         # ファイルの内容を読み込む
         file_content = await file.read()
         
-        # ユーザーのアバター情報を更新
-        current_user.avatar_data = file_content
-        current_user.avatar_content_type = file.content_type
-        current_user.updated_at = datetime.utcnow()
-        db.commit()
-        db.refresh(current_user)
+        # ユーザーのアバター情報を更新（縮小版もここで作っておく）
+        user = await current_user.load(db)
+        await save_avatar(db, user, file_content, file.content_type)
+        user.updated_at = datetime.utcnow()
+        # アバターのURLはナレッジ一覧にも表示される
+        await bump_collection_version(db, KNOWLEDGE_LIST)
+
+        def refresh_caches() -> None:
+            principal_cache.invalidate(user.email)
+            leaderboard.update_profile(user.id, user.username, user.department, user.small_avatar_url)
+            response_cache.invalidate("ranking:*", "popular")
+
+        after_commit(db, refresh_caches)
         
         return {
             "message": "Avatar updated successfully",
-            "contentType": current_user.avatar_content_type
+            "contentType": user.avatar_content_type,
+            "avatarUrl": user.avatar_url
         }
         
     except Exception as e:
@@ -229,54 +221,97 @@ async def update_avatar(
 
 @router.get("/me/avatar")
 async def get_avatar(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    if not current_user.avatar_data:
+    avatar = await db.get(UserAvatar, (current_user.id, ORIGINAL))
+    if not avatar:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Avatar not found"
         )
     
     return Response(
-        content=current_user.avatar_data,
-        media_type=current_user.avatar_content_type
+        content=avatar.data,
+        media_type=served_content_type(avatar.content_type),
+        headers=AVATAR_RESPONSE_HEADERS
+    )
+
+@avatar_router.get("/{user_id}/avatar")
+async def get_user_avatar(
+    user_id: int,
+    request: Request,
+    size: Optional[str] = Query(None, pattern="^(small|medium)$"),
+    v: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    # まずハッシュだけを取得し、変わっていなければ画像本体は読み込まずに304を返す
+    avatar_etag = await db.scalar(select(User.avatar_etag).where(User.id == user_id))
+    variants = {
+        row.variant: row
+        for row in (
+            await db.execute(
+                select(UserAvatar.variant, UserAvatar.etag, UserAvatar.content_type)
+                .where(UserAvatar.user_id == user_id, UserAvatar.variant.in_([size or ORIGINAL, ORIGINAL]))
+            )
+        ).all()
+    }
+    # 縮小版がない場合（Pillowがない環境など）は元画像を返す
+    variant = variants.get(size or ORIGINAL) or variants.get(ORIGINAL)
+    if avatar_etag is None or variant is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Avatar not found"
+        )
+
+    etag = f'"{variant.etag}"'
+    headers = {"ETag": etag, **AVATAR_RESPONSE_HEADERS}
+    if v == avatar_version(avatar_etag):
+        # バージョン付きURLの内容は変わらないので長期間キャッシュさせる
+        headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    else:
+        headers["Cache-Control"] = "public, no-cache"
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    content = await db.scalar(
+        select(UserAvatar.data).where(UserAvatar.user_id == user_id, UserAvatar.variant == variant.variant)
     )
+    return Response(content=content, media_type=served_content_type(variant.content_type), headers=headers)
 
 @router.get("/mypage")
 async def get_mypage(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    # プロフィール情報を取得
-    profile = db.query(Profile).filter(Profile.user_id == current_user.id).first()
-    if not profile:
-        profile = Profile(user_id=current_user.id)
-        db.add(profile)
-        db.commit()
-        db.refresh(profile)
+    # プロフィール情報を取得（まだ作られていない場合は空の値を返す。作成は更新時に行う）
+    profile = (
+        await db.execute(select(Profile).where(Profile.user_id == current_user.id))
+    ).scalar_one_or_none() or Profile(user_id=current_user.id)
 
     # 登録ナレッジ数を取得
-    knowledge_count = db.query(Knowledge).filter(
-        Knowledge.author_id == current_user.id
-    ).count()
+    knowledge_count = await db.scalar(
+        select(func.count(Knowledge.id)).where(Knowledge.author_id == current_user.id)
+    )
 
     # 累積PV数を取得
-    total_views = db.query(func.sum(Knowledge.views)).filter(
-        Knowledge.author_id == current_user.id
-    ).scalar() or 0
+    total_views = await db.scalar(
+        select(func.sum(Knowledge.views)).where(Knowledge.author_id == current_user.id)
+    ) or 0
 
     # 次のレベルまでに必要な経験値を計算
-    next_level_exp = (current_user.level + 1) * 100 - current_user.experience_points
+    next_level_exp = level_curve.required_xp(current_user.level) - current_user.current_xp
 
     # 最近のナレッジを取得（最新5件）
     recent_knowledge = (
-        db.query(Knowledge)
-        .filter(Knowledge.author_id == current_user.id)
-        .order_by(Knowledge.created_at.desc())
-        .limit(5)
-        .all()
-    )
+        await db.execute(
+            select(Knowledge)
+            .where(Knowledge.author_id == current_user.id)
+            .order_by(Knowledge.created_at.desc())
+            .limit(5)
+        )
+    ).scalars().all()
 
     # ナレッジリストの作成
     knowledge_list = []
@@ -313,6 +348,59 @@ async def get_mypage(
         "knowledgeList": knowledge_list
     }
 
+# /me・/mypage より後に定義しないと、"me" が user_id として解釈されて422になる
+@router.get("/{user_id}")
+async def get_user_profile(
+    user_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    # ユーザー情報を取得
+    user = await db.get(User, user_id)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="ユーザーが見つかりません"
+        )
+    
+    # ユーザーの最新のナレッジを取得
+    recent_knowledge = (
+        await db.execute(
+            select(Knowledge)
+            .where(Knowledge.author_id == user.id)
+            .order_by(Knowledge.created_at.desc())
+            .limit(5)
+        )
+    ).scalars().all()
+
+    # アクティビティリストの作成
+    activities = []
+    for knowledge in recent_knowledge:
+        activities.append({
+            "id": knowledge.id,
+            "title": knowledge.title,
+            "category": knowledge.category,
+            "method": knowledge.method,
+            "target": knowledge.target,
+            "views": knowledge.views,
+            "createdAt": knowledge.created_at.strftime("%Y年%m月%d日"),
+            "author": {
+                "id": user.id,
+                "name": user.username,
+                "avatarUrl": user.avatar_url
+            }
+        })
+
+    return {
+        "id": user.id,
+        "email": user.email,
+        "name": user.username,
+        "department": user.department,
+        "level": user.level,
+        "currentXp": user.current_xp,
+        "avatar": user.avatar_url,
+        "activity": activities
+    }
+
 def get_category_icon_and_color(category: str) -> tuple[str, str]:
     """カテゴリーに基づいてアイコンと背景色を返す"""
     category_mapping = {
@@ -1,13 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
 from typing import List
 from pydantic import BaseModel
 
 from models.database import get_db
 from models.user import User
-from models.user_activity import UserActivity
-from core.security import get_current_user
+from core.security import CurrentUser, get_current_user
+from core.config import settings
+from utils.leaderboard import LeaderboardEntry, leaderboard
+from utils.response_cache import response_cache
 from typing import Optional, List
 router = APIRouter(prefix="/ranking", tags=["ranking"])
 
@@ -28,130 +30,106 @@ def get_position_suffix(position: int) -> str:
         return "rd"
     return "th"
 
-@router.get("/level", response_model=List[RankingResponse])
-async def get_level_ranking(
-    limit: int = 5,
-    db: Session = Depends(get_db)
-):
-    # レベルに基づくランキング
-    users = (
-        db.query(User)
-        .order_by(User.level.desc(), User.experience_points.desc())
-        .limit(limit)
-        .all()
-    )
-    
+def to_ranking_list(entries: List[LeaderboardEntry]) -> List[dict]:
     ranking_list = []
-    for i, user in enumerate(users, 1):
+    for i, entry in enumerate(entries, 1):
         position = f"{i}{get_position_suffix(i)}"
         ranking_list.append({
-            "id": user.id,
+            "id": entry.id,
             "position": position,
-            "name": user.username,
-            "department": user.department or "所属なし",
-            "level": user.level,
-            "avatar_url": user.avatar_url
+            "name": entry.username,
+            "department": entry.department or "所属なし",
+            "level": entry.level,
+            "avatar_url": entry.avatar_url
         })
-    
     return ranking_list
 
+@router.get("/level", response_model=List[RankingResponse])
+async def get_level_ranking(
+    limit: int = 5,
+    db: AsyncSession = Depends(get_db)
+):
+    # レベルに基づくランキング（メモリ上のランキングから取得）
+    async def compute():
+        await leaderboard.ensure_built(db)
+        return to_ranking_list(leaderboard.top_by_level(limit))
+
+    return await response_cache.get_or_compute(
+        "ranking:level", {"limit": limit}, compute, ttl=settings.RESPONSE_CACHE_TTL_SECONDS
+    )
+
 @router.get("/points", response_model=List[RankingResponse])
 async def get_points_ranking(
     limit: int = 5,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    # ポイントに基づくランキング
-    users = (
-        db.query(User)
-        .order_by(User.points.desc())
-        .limit(limit)
-        .all()
+    # ポイントに基づくランキング（メモリ上のランキングから取得）
+    async def compute():
+        await leaderboard.ensure_built(db)
+        return to_ranking_list(leaderboard.top_by_points(limit))
+
+    return await response_cache.get_or_compute(
+        "ranking:points", {"limit": limit}, compute, ttl=settings.RESPONSE_CACHE_TTL_SECONDS
     )
-    
-    ranking_list = []
-    for i, user in enumerate(users, 1):
-        position = f"{i}{get_position_suffix(i)}"
-        ranking_list.append({
-            "id": user.id,
-            "position": position,
-            "name": user.username,
-            "department": user.department or "所属なし",
-            "level": user.level,
-            "avatar_url": user.avatar_url
-        })
-    
-    return ranking_list
 
 @router.get("/activity", response_model=List[RankingResponse])
 async def get_activity_ranking(
     limit: int = 5,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    # アクティビティ数に基づくランキング
-    ranking = (
-        db.query(
-            User,
-            func.count(UserActivity.id).label('activity_count')
-        )
-        .join(UserActivity)
-        .group_by(User.id)
-        .order_by(func.count(UserActivity.id).desc())
-        .limit(limit)
-        .all()
-    )
+    # アクティビティ数に基づくランキング（users.activity_count を参照）
+    async def compute():
+        users = (
+            await db.execute(
+                select(User)
+                .where(User.activity_count > 0)
+                .order_by(User.activity_count.desc())
+                .limit(limit)
+            )
+        ).scalars().all()
     
-    ranking_list = []
-    for i, (user, _) in enumerate(ranking, 1):
-        position = f"{i}{get_position_suffix(i)}"
-        ranking_list.append({
-            "id": user.id,
-            "position": position,
-            "name": user.username,
-            "department": user.department or "所属なし",
-            "level": user.level,
-            "avatar_url": user.avatar_url
-        })
+        ranking_list = []
+        for i, user in enumerate(users, 1):
+            position = f"{i}{get_position_suffix(i)}"
+            ranking_list.append({
+                "id": user.id,
+                "position": position,
+                "name": user.username,
+                "department": user.department or "所属なし",
+                "level": user.level,
+                "avatar_url": user.small_avatar_url
+            })
     
-    return ranking_list
+        return ranking_list
+
+    return await response_cache.get_or_compute(
+        "ranking:activity", {"limit": limit}, compute, ttl=settings.RESPONSE_CACHE_TTL_SECONDS
+    )
 
 @router.get("/me")
 async def get_my_rank(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
+    await leaderboard.ensure_built(db)
+    if leaderboard.level_rank(current_user.id) is None:
+        # 認証キャッシュのスナップショットは古いことがあるので、DBから読み直して追加する
+        snapshot = await CurrentUser.fetch(db, current_user.email)
+        if snapshot is not None:
+            leaderboard.add_if_missing(snapshot)
+
     # レベルランキングでの自分の順位
-    level_rank = (
-        db.query(func.count(User.id))
-        .filter(
-            (User.level > current_user.level) |
-            ((User.level == current_user.level) & (User.experience_points > current_user.experience_points))
-        )
-        .scalar() + 1
-    )
-    
+    level_rank = leaderboard.level_rank(current_user.id)
+
     # ポイントランキングでの自分の順位
-    points_rank = (
-        db.query(func.count(User.id))
-        .filter(User.points > current_user.points)
-        .scalar() + 1
-    )
+    points_rank = leaderboard.points_rank(current_user.id)
     
     # アクティビティランキングでの自分の順位
-    my_activity_count = (
-        db.query(func.count(UserActivity.id))
-        .filter(UserActivity.user_id == current_user.id)
-        .scalar() or 0
-    )
-    
     activity_rank = (
-        db.query(func.count())
-        .from_self(
-            db.query(User.id, func.count(UserActivity.id).label('count'))
-            .join(UserActivity)
-            .group_by(User.id)
-            .having(func.count(UserActivity.id) > my_activity_count)
-        )
-        .scalar() or 0
+        await db.scalar(
+            select(func.count(User.id))
+            .where(User.activity_count > (current_user.activity_count or 0))
+        ) or 0
     ) + 1
     
     return {
@@ -25,6 +25,7 @@ run_with_output python3 -c 'from models.database import engine; print("✅ DB co
 
 # FastAPIアプリ起動
 exec gunicorn main:app \
+    -c gunicorn.conf.py \
     --workers 1 \
     --worker-class uvicorn.workers.UvicornWorker \
     --bind=0.0.0.0:8000 \
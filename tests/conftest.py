@@ -0,0 +1,102 @@
+"""
+APIテスト用のフィクスチャ
+
+一時的なSQLiteデータベース（aiosqlite）に対してアプリを起動する。
+TEST_DATABASE_URL を指定するとそのDBを使う（テスト用のDBを指定すること）。
+設定の必須項目（SECRET_KEY や MYSQL_* など）にはテスト用の値を入れるので、.env がなくても動く。
+"""
+import os
+import tempfile
+import uuid
+
+_tmp_dir = tempfile.mkdtemp(prefix="rebema-test-")
+for key, value in {
+    "SECRET_KEY": "test-secret-key",
+    "MYSQL_HOST": "localhost",
+    "MYSQL_PORT": "3306",
+    "MYSQL_USER": "test",
+    "MYSQL_PASSWORD": "test",
+    "MYSQL_DB": "test",
+    "MYSQL_SSL_MODE": "disable",
+    "AZURE_STORAGE_CONNECTION_STRING": "unused",
+    "AZURE_STORAGE_CONTAINER_NAME": "unused",
+}.items():
+    os.environ.setdefault(key, value)
+# 開発用の .env にDBや保存先があっても、テストでは使わない
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL") or "sqlite:///" + os.path.join(_tmp_dir, "test.db")
+os.environ["BLOB_STORE_BACKEND"] = "local"
+os.environ["LOCAL_BLOB_STORE_PATH"] = os.path.join(_tmp_dir, "storage")
+
+import pytest
+from fastapi.testclient import TestClient
+
+from core.security import create_access_token
+from models.database import Base, SessionLocal, engine
+from models.knowledge import Knowledge
+from models.user import User
+
+
+@pytest.fixture(scope="session")
+def app():
+    import main
+
+    Base.metadata.create_all(engine)
+    return main.app
+
+
+@pytest.fixture(scope="session")
+def client(app):
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def db():
+    """データの準備用の同期セッション"""
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def make_user(db):
+    """ユーザーを作成し、(ユーザー, 認証ヘッダー) を返す"""
+    def make(**values):
+        email = f"test-{uuid.uuid4().hex}@example.com"
+        user = User(**{
+            "email": email,
+            "username": email.split("@")[0],
+            "level": 1,
+            "points": 0,
+            "current_xp": 0,
+            "experience_points": 0,
+            **values,
+        })
+        db.add(user)
+        db.commit()
+        return user, {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+
+    return make
+
+
+@pytest.fixture
+def make_knowledge(db):
+    """author が投稿したナレッジを count 件作成する"""
+    def make(author: User, count: int = 1, **values):
+        knowledges = [
+            Knowledge(
+                title=f"ナレッジ {i}",
+                method="メール",
+                target="新規顧客",
+                description="説明",
+                category="メール",
+                author_id=author.id,
+                **values,
+            )
+            for i in range(count)
+        ]
+        db.add_all(knowledges)
+        db.commit()
+        return knowledges
+
+    return make
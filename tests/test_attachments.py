@@ -0,0 +1,68 @@
+import asyncio
+import io
+import os
+
+import anyio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.datastructures import Headers, UploadFile
+
+from models.blob import Blob
+from models.database import ASYNC_SQLALCHEMY_DATABASE_URL
+from utils.attachments import store_attachment, sweep_orphaned_blobs
+from utils.blob_store import LocalBlobStore
+
+
+def make_upload(content: bytes) -> UploadFile:
+    return UploadFile(io.BytesIO(content), filename="a.txt", headers=Headers({"content-type": "text/plain"}))
+
+
+def run(scenario):
+    async def main():
+        bind = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL)
+        try:
+            return await scenario(bind)
+        finally:
+            await bind.dispose()
+    return asyncio.run(main())
+
+
+def test_same_content_is_stored_once(app, tmp_path):
+    store = LocalBlobStore(str(tmp_path))
+    content = os.urandom(64)
+
+    async def scenario(bind):
+        return (
+            await store_attachment(bind, store, make_upload(content)),
+            await store_attachment(bind, store, make_upload(content)),
+        )
+
+    first, second = run(scenario)
+    assert second.key == first.key
+    assert os.listdir(os.path.dirname(store.path(first.key))) == [os.path.basename(first.key)]
+
+
+def test_reupload_during_sweep_keeps_the_new_file(app, db, tmp_path):
+    content = os.urandom(64)
+
+    class ReuploadingStore(LocalBlobStore):
+        reuploaded = None
+
+        def delete(self, key):
+            # スイーパーが行を消してから本体を消すまでの間に、同じ内容がアップロードされる
+            self.reuploaded = anyio.from_thread.run(store_attachment, self.bind, self, make_upload(content))
+            super().delete(key)
+
+    store = ReuploadingStore(str(tmp_path))
+
+    async def scenario(bind):
+        store.bind = bind
+        original = await store_attachment(bind, store, make_upload(content))
+        deleted = await sweep_orphaned_blobs(bind, store, grace_seconds=-1)
+        return original, deleted
+
+    original, deleted = run(scenario)
+    assert deleted >= 1
+    assert not os.path.exists(store.path(original.key))
+    assert os.path.exists(store.path(store.reuploaded.key))
+    assert db.scalar(select(Blob.storage_key).where(Blob.sha256 == original.sha256)) == store.reuploaded.key
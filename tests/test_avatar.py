@@ -0,0 +1,53 @@
+import io
+
+import pytest
+from sqlalchemy import update
+
+from models.user_avatar import UserAvatar
+from utils.avatars import ORIGINAL
+
+SVG = b'<svg xmlns="http://www.w3.org/2000/svg"><script>alert(1)</script></svg>'
+
+
+def png() -> bytes:
+    Image = pytest.importorskip("PIL.Image")
+    buffer = io.BytesIO()
+    Image.new("RGB", (4, 4), "red").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def upload(client, headers, content, content_type):
+    return client.post(
+        "/profile/profile/me/avatar", files={"file": ("avatar", content, content_type)}, headers=headers
+    )
+
+
+def test_svg_avatar_is_rejected(client, make_user):
+    _, headers = make_user()
+    assert upload(client, headers, SVG, "image/svg+xml").status_code == 400
+
+
+def test_avatar_is_served_with_nosniff(client, make_user):
+    user, headers = make_user()
+    assert upload(client, headers, png(), "image/png").status_code == 200
+
+    response = client.get(f"/profile/{user.id}/avatar")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["x-content-type-options"] == "nosniff"
+
+
+def test_previously_stored_svg_is_not_served_as_svg(client, db, make_user):
+    user, headers = make_user()
+    assert upload(client, headers, png(), "image/png").status_code == 200
+    # 制限を入れる前にアップロードされたSVG
+    db.execute(
+        update(UserAvatar).where(UserAvatar.user_id == user.id, UserAvatar.variant == ORIGINAL)
+        .values(content_type="image/svg+xml", data=SVG)
+    )
+    db.commit()
+
+    response = client.get(f"/profile/{user.id}/avatar")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/octet-stream"
+    assert response.headers["x-content-type-options"] == "nosniff"
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+from sqlalchemy import func, select, text
+
+from core.config import settings
+from models.database import BACKEND
+from models.knowledge import Knowledge
+from models.unit_of_work import unit_of_work_metrics
+from models.user import User
+from models.user_activity import UserActivity
+from utils.bulk_import import BATCH_SIZE, XP_PER_KNOWLEDGE
+
+
+def bulk_line(**values):
+    return json.dumps({"title": "ナレッジ", "method": "メール", "target": "新規顧客", **values})
+
+
+def test_bulk_import_requires_allow_list(client, db, make_user, monkeypatch):
+    # ほかのユーザー名義で登録できるので、許可リストのユーザー以外には使わせない
+    importer, headers = make_user()
+    author, _ = make_user()
+    monkeypatch.setattr(settings, "BULK_IMPORT_ALLOWED_EMAILS", "")
+    response = client.post("/knowledge/bulk", content=bulk_line(author_email=author.email).encode(), headers=headers)
+    assert response.status_code == 403
+
+    db.expire_all()
+    assert db.get(User, author.id).points == 0
+
+
+def test_bulk_import_grants_experience_per_inserted_row(client, db, make_user, monkeypatch):
+    importer, headers = make_user()
+    monkeypatch.setattr(settings, "BULK_IMPORT_ALLOWED_EMAILS", importer.email)
+    author, _ = make_user()
+    rows = BATCH_SIZE * 2 + 10
+    lines = [bulk_line(title=f"ナレッジ {i}", author_email=author.email) for i in range(rows)]
+    lines.insert(BATCH_SIZE, bulk_line(author_email="missing@example.com"))
+
+    response = client.post("/knowledge/bulk", content="\n".join(lines).encode(), headers=headers)
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["inserted"], result["failed"]) == (rows, 1)
+
+    db.expire_all()
+    user = db.get(User, author.id)
+    ledger = db.scalar(select(func.count(UserActivity.id)).where(UserActivity.user_id == author.id))
+    assert user.activity_count == ledger == rows
+    assert user.points == rows * XP_PER_KNOWLEDGE
+    # バッチごとの結果を、最初の加算前から最後の加算後までにまとめて返す
+    experience = result["experience"][str(author.id)]
+    assert (experience["before_level"], experience["before_xp"]) == (1, 0)
+    assert (experience["after_level"], experience["after_xp"]) == (user.level, user.current_xp)
+    assert experience["level_up"] == (user.level > 1)
+    assert str(importer.id) not in result["experience"]
+
+
+@pytest.fixture
+def failing_title(db):
+    """このタイトルの INSERT だけ失敗させる（SQLiteのトリガー）"""
+    if BACKEND != "sqlite":
+        pytest.skip("トリガーはSQLiteでだけ作る")
+    title = "失敗させる行"
+    db.execute(text(
+        "CREATE TRIGGER fail_bulk_insert BEFORE INSERT ON knowledges "
+        f"WHEN NEW.title = '{title}' BEGIN SELECT RAISE(ABORT, 'failed'); END"
+    ))
+    db.commit()
+    yield title
+    db.execute(text("DROP TRIGGER fail_bulk_insert"))
+    db.commit()
+
+
+def test_failed_batch_is_retried_row_by_row_in_one_commit(client, db, make_user, monkeypatch, failing_title):
+    importer, headers = make_user()
+    monkeypatch.setattr(settings, "BULK_IMPORT_ALLOWED_EMAILS", importer.email)
+    lines = [bulk_line(title=f"ナレッジ {i}") for i in range(5)]
+    lines.insert(2, bulk_line(title=failing_title))
+    before = unit_of_work_metrics.stats()
+
+    response = client.post("/knowledge/bulk", content="\n".join(lines).encode(), headers=headers)
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["inserted"], result["failed"]) == (5, 1)
+    assert result["errors"][0]["line"] == 3
+
+    # 入れ直した行と経験値を1回でコミットし、一覧の版はリクエストの最後にコミットする
+    after = unit_of_work_metrics.stats()
+    assert after["commits"] - before["commits"] == 2
+
+    db.expire_all()
+    user = db.get(User, importer.id)
+    knowledges = db.scalar(select(func.count(Knowledge.id)).where(Knowledge.author_id == importer.id))
+    ledger = db.scalar(select(func.count(UserActivity.id)).where(UserActivity.user_id == importer.id))
+    assert knowledges == ledger == user.activity_count == 5
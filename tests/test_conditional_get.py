@@ -0,0 +1,90 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from models.database import ASYNC_SQLALCHEMY_DATABASE_URL
+from models.knowledge import Knowledge
+from models.user import User
+from utils.experience import add_experience
+
+
+def test_list_etag_ignores_views_and_xp(client, db, make_user, make_knowledge):
+    author, headers = make_user()
+    make_knowledge(author, 2)
+    etag = client.get("/knowledge/", headers=headers).headers["etag"]
+
+    # 閲覧数の反映・経験値の付与では一覧の版は変わらない
+    db.execute(update(Knowledge).values(views=Knowledge.views + 1, updated_at=Knowledge.updated_at))
+    db.execute(update(User).where(User.id == author.id).values(points=User.points + 10))
+    db.commit()
+
+    assert client.get("/knowledge/", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+
+def test_list_etag_changes_on_delete_and_author_rename(client, make_user, make_knowledge):
+    author, headers = make_user()
+    oldest, _ = make_knowledge(author, 2)
+    etag = client.get("/knowledge/", headers=headers).headers["etag"]
+
+    assert client.delete(f"/knowledge/{oldest.id}", headers=headers).status_code == 200
+    response = client.get("/knowledge/", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    assert client.put("/profile/profile/me", json={"username": f"renamed-{author.id}"}, headers=headers).status_code == 200
+    assert client.get("/knowledge/", headers={**headers, "If-None-Match": etag}).status_code == 200
+
+
+def test_list_etag_changes_on_edits_in_the_same_second(client, db, make_user, make_knowledge):
+    author, headers = make_user()
+    first, second = make_knowledge(author, 2)
+    form = {"title": "更新", "method": "メール", "target": "新規顧客", "description": "説明"}
+    same_second = datetime.utcnow().replace(microsecond=0)
+
+    def edit(knowledge):
+        assert client.put(f"/knowledge/{knowledge.id}", data=form, headers=headers).status_code == 200
+        # MySQLの DATETIME と同じく秒単位に丸める
+        db.execute(update(Knowledge).where(Knowledge.id.in_([first.id, second.id])).values(updated_at=same_second))
+        db.commit()
+
+    edit(first)
+    etag = client.get("/knowledge/", headers=headers).headers["etag"]
+    edit(second)
+    assert client.get("/knowledge/", headers={**headers, "If-None-Match": etag}).status_code == 200
+
+
+def test_detail_etag_ignores_views(client, db, make_user, make_knowledge):
+    author, headers = make_user()
+    knowledge, = make_knowledge(author)
+    etag = client.get(f"/knowledge/{knowledge.id}", headers=headers).headers["etag"]
+
+    db.execute(update(Knowledge).where(Knowledge.id == knowledge.id).values(views=Knowledge.views + 5, updated_at=Knowledge.updated_at))
+    db.commit()
+
+    response = client.get(f"/knowledge/{knowledge.id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_detail_etag_ignores_xp_awards(client, db, make_user, make_knowledge):
+    author, headers = make_user(updated_at=datetime(2024, 1, 1))
+    knowledge, = make_knowledge(author)
+    etag = client.get(f"/knowledge/{knowledge.id}", headers=headers).headers["etag"]
+
+    async def award():
+        engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL)
+        try:
+            async with AsyncSession(engine) as session:
+                # レベルアップする量（加算とレベルの書き直しの両方の UPDATE を通る）
+                result = await add_experience(author.id, 150, session, action="test")
+                await session.commit()
+            return result
+        finally:
+            await engine.dispose()
+
+    assert asyncio.run(award())["level_up"]
+    db.expire_all()
+    assert db.get(User, author.id).updated_at == datetime(2024, 1, 1)
+    response = client.get(f"/knowledge/{knowledge.id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
@@ -0,0 +1,69 @@
+import hashlib
+
+import pytest
+
+CONTENT = b"0123456789abcdefghij"
+ETAG = f'"{hashlib.sha256(CONTENT).hexdigest()}"'
+
+
+@pytest.fixture
+def file_url(client, make_user):
+    _, headers = make_user()
+    response = client.post(
+        "/knowledge/",
+        data={"title": "タイトル", "method": "メール", "target": "新規顧客", "description": "説明"},
+        files=[("files", ("data.bin", CONTENT, "application/octet-stream"))],
+        headers=headers,
+    )
+    assert response.status_code == 200
+    knowledge = client.get(f"/knowledge/{response.json()['id']}", headers=headers).json()
+    return knowledge["files"][0]["url"], headers
+
+
+def test_full_download(client, file_url):
+    url, headers = file_url
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["etag"] == ETAG
+    assert response.headers["accept-ranges"] == "bytes"
+
+
+def test_range_returns_partial_content(client, file_url):
+    url, headers = file_url
+    response = client.get(url, headers={**headers, "Range": "bytes=5-9"})
+    assert response.status_code == 206
+    assert response.content == CONTENT[5:10]
+    assert response.headers["content-range"] == f"bytes 5-9/{len(CONTENT)}"
+
+    response = client.get(url, headers={**headers, "Range": "bytes=-4"})
+    assert response.status_code == 206
+    assert response.content == CONTENT[-4:]
+
+
+def test_range_outside_the_file_is_not_satisfiable(client, file_url):
+    url, headers = file_url
+    response = client.get(url, headers={**headers, "Range": "bytes=100-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+
+def test_if_range(client, file_url):
+    url, headers = file_url
+    response = client.get(url, headers={**headers, "Range": "bytes=5-9", "If-Range": ETAG})
+    assert response.status_code == 206
+    assert response.content == CONTENT[5:10]
+
+    # 一致しない（古い・弱いETag）なら Range を無視して全体を返す。範囲外でも416にしない
+    for if_range in ('"stale"', f"W/{ETAG}"):
+        for range_header in ("bytes=5-9", "bytes=100-"):
+            response = client.get(url, headers={**headers, "Range": range_header, "If-Range": if_range})
+            assert response.status_code == 200
+            assert response.content == CONTENT
+
+
+def test_if_none_match_returns_not_modified(client, file_url):
+    url, headers = file_url
+    response = client.get(url, headers={**headers, "If-None-Match": ETAG})
+    assert response.status_code == 304
+    assert response.content == b""
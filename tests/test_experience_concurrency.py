@@ -0,0 +1,70 @@
+"""
+経験値付与の同時実行テスト
+
+同じユーザーへの経験値の付与を多数のトランザクションから同時に行い、
+加算が1件も失われていないこと（経験値・ポイント・アクティビティ数・台帳の件数・レベル）を確認する。
+MySQL で確認する場合は TEST_DATABASE_URL にテスト用のDBを指定する。
+"""
+import asyncio
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from models.database import ASYNC_SQLALCHEMY_DATABASE_URL, BACKEND
+from models.user import User
+from models.user_activity import UserActivity
+from utils.experience import add_experience
+from utils.level_curve import level_curve
+
+AWARDS = 300
+XP = 7
+USERS = 3
+
+# デッドロックやロック待ちのタイムアウトで失敗したトランザクションをやり直す回数
+MAX_RETRIES = 20
+
+
+async def award(engine, user_id: int) -> None:
+    """1回の付与を1トランザクションで行う"""
+    for attempt in range(MAX_RETRIES):
+        try:
+            async with AsyncSession(engine, expire_on_commit=False) as db:
+                await add_experience(user_id, XP, db, action="stress_test")
+                await db.commit()
+            return
+        except OperationalError:
+            await asyncio.sleep(0.01 * (attempt + 1))
+    raise RuntimeError("リトライの上限に達しました")
+
+
+async def award_concurrently(user_ids):
+    if BACKEND == "sqlite":
+        # SQLiteは書き込みが直列になるので、ロック待ちを長めにする
+        engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, connect_args={"timeout": 60})
+    else:
+        engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, pool_size=20, max_overflow=0)
+    try:
+        await asyncio.gather(*(award(engine, user_ids[i % len(user_ids)]) for i in range(AWARDS)))
+    finally:
+        await engine.dispose()
+
+
+def test_concurrent_awards_are_not_lost(app, db, make_user):
+    user_ids = [make_user()[0].id for _ in range(USERS)]
+
+    asyncio.run(award_concurrently(user_ids))
+
+    db.expire_all()
+    for index, user_id in enumerate(user_ids):
+        expected_awards = len(range(index, AWARDS, USERS))
+        expected_xp = expected_awards * XP
+        user = db.get(User, user_id)
+        ledger = db.scalar(select(func.count(UserActivity.id)).where(UserActivity.user_id == user_id))
+        state = level_curve.state(expected_xp)
+
+        assert user.experience_points + user.current_xp == expected_xp
+        assert user.points == expected_xp
+        assert user.activity_count == expected_awards
+        assert ledger == expected_awards
+        assert (user.level, user.current_xp) == (state.level, state.current_xp)
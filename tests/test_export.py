@@ -0,0 +1,52 @@
+import json
+from datetime import datetime, timedelta
+
+from core.config import settings
+from models.user_activity import UserActivity
+from utils.export import parse_watermark
+
+
+def export_ids(client, user, headers, since=None):
+    """user のアクティビティのうち出力されたIDと、次回のウォーターマーク"""
+    params = {"since": since} if since else {}
+    response = client.get("/export/user_activities", params=params, headers=headers)
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    return [row["id"] for row in rows if row["user_id"] == user.id], response.headers["x-export-watermark"]
+
+
+def test_export_requires_allow_list(client, make_user, monkeypatch):
+    user, headers = make_user()
+    monkeypatch.setattr(settings, "EXPORT_ALLOWED_EMAILS", "")
+    assert client.get("/export/user_activities", headers=headers).status_code == 403
+
+    monkeypatch.setattr(settings, "EXPORT_ALLOWED_EMAILS", f"someone@example.com, {user.email.upper()}")
+    assert client.get("/export/user_activities", headers=headers).status_code == 200
+
+
+def test_incremental_export_keeps_rows_in_the_same_second(client, db, make_user, monkeypatch):
+    user, headers = make_user()
+    monkeypatch.setattr(settings, "EXPORT_ALLOWED_EMAILS", user.email)
+    monkeypatch.setattr(settings, "EXPORT_WATERMARK_LAG_SECONDS", 60)
+    second = datetime.utcnow().replace(microsecond=0) - timedelta(minutes=5)
+
+    first = UserActivity(user_id=user.id, action="test", xp_amount=1, timestamp=second)
+    db.add(first)
+    db.commit()
+    ids, watermark = export_ids(client, user, headers)
+    assert ids == [first.id]
+    assert parse_watermark(watermark) >= (second, first.id)
+
+    # 同じ秒の行と、まだ猶予期間内の新しい行
+    same_second = UserActivity(user_id=user.id, action="test", xp_amount=1, timestamp=second)
+    recent = UserActivity(user_id=user.id, action="test", xp_amount=1, timestamp=datetime.utcnow())
+    db.add_all([same_second, recent])
+    db.commit()
+    ids, watermark = export_ids(client, user, headers, since=watermark)
+    assert same_second.id in ids
+    assert recent.id not in ids
+
+    # 猶予期間が過ぎると次の差分で出力される
+    monkeypatch.setattr(settings, "EXPORT_WATERMARK_LAG_SECONDS", -60)
+    ids, _ = export_ids(client, user, headers, since=watermark)
+    assert ids == [recent.id]
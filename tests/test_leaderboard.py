@@ -0,0 +1,40 @@
+from dataclasses import replace
+
+from sqlalchemy import update
+
+from core.security import principal_cache
+from models.user import User
+from utils.leaderboard import leaderboard
+
+
+def test_my_rank_adds_fresh_values_not_the_cached_snapshot(client, db, make_user):
+    _, other_headers = make_user(points=1)
+    assert client.get("/ranking/ranking/me", headers=other_headers).status_code == 200
+    user, headers = make_user()
+    # 認証キャッシュにスナップショットを載せておく
+    assert client.get("/ranking/ranking/me", headers=headers).status_code == 200
+    assert principal_cache.get(user.email).points == 0
+
+    # 別のワーカーで経験値が加算された（このワーカーのランキングにはまだない）
+    db.execute(update(User).where(User.id == user.id).values(points=10 ** 9, updated_at=User.updated_at))
+    db.commit()
+    leaderboard.remove(user.id)
+
+    assert client.get("/ranking/ranking/me", headers=headers).status_code == 200
+    assert leaderboard.top_by_points(1)[0].id == user.id
+
+
+def test_profile_change_keeps_level_and_points(client, make_user):
+    user, headers = make_user()
+    assert client.get("/ranking/ranking/me", headers=headers).status_code == 200
+
+    # リクエストが user を読んだ後に、経験値の加算がコミットされた状態
+    awarded = replace(principal_cache.get(user.email), level=999, experience_points=10 ** 9, points=10 ** 9 + 1)
+    leaderboard.update(awarded)
+
+    response = client.put("/profile/profile/me", json={"username": f"renamed-{user.id}"}, headers=headers)
+    assert response.status_code == 200
+
+    entry = leaderboard.top_by_points(1)[0]
+    assert (entry.id, entry.username) == (user.id, f"renamed-{user.id}")
+    assert (entry.level, entry.points) == (999, 10 ** 9 + 1)
@@ -0,0 +1,9 @@
+def test_metrics_replace_stats(client, make_user):
+    _, headers = make_user()
+    client.get("/knowledge/", headers=headers)
+
+    assert client.get("/stats").status_code == 404
+    body = client.get("/metrics").text
+    assert 'rebema_http_requests_total{method="GET",route="/knowledge/",status="200"}' in body
+    assert 'rebema_unit_of_work_requests_total{commits="0"}' in body
+    assert "rebema_db_pool_connections" in body
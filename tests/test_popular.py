@@ -0,0 +1,19 @@
+from utils.response_cache import response_cache
+
+
+def test_popular_query_count_does_not_depend_on_limit(client, make_user, make_knowledge, query_budget):
+    for _ in range(10):
+        author, _ = make_user()
+        make_knowledge(author, 6)
+
+    counts = {}
+    for limit in (1, 50):
+        # キャッシュから返さず、毎回集計させる
+        response_cache.clear()
+        with query_budget(1):
+            response = client.get("/knowledge/popular", params={"limit": limit})
+        assert response.status_code == 200
+        assert len(response.json()["items"]) == limit
+        counts[limit] = query_budget.requests[-1][2].queries
+
+    assert counts[1] == counts[50]
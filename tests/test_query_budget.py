@@ -0,0 +1,40 @@
+import pytest
+
+
+def test_knowledge_list_loads_authors_in_bulk(client, make_user, make_knowledge, query_budget):
+    # 著者ごとに1クエリ（N+1）にならず、件数や著者数によらず一定のクエリ数で返す
+    _, headers = make_user()
+    for _ in range(5):
+        author, _ = make_user()
+        make_knowledge(author, 6)
+
+    # 認証・一覧の版・一覧・著者の一括読み込み
+    with query_budget(4):
+        response = client.get("/knowledge/", params={"limit": 30}, headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 30
+
+
+def test_query_budget_fails_when_exceeded(client, make_user, query_budget):
+    _, headers = make_user()
+    with pytest.raises(pytest.fail.Exception, match="クエリ数が上限を超えました"):
+        with query_budget(0):
+            client.get("/knowledge/", headers=headers)
+
+
+def test_server_timing_is_not_sent_in_production(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from core.config import settings
+    from utils.query_stats import QueryStatsMiddleware
+
+    def headers_for(environment):
+        monkeypatch.setattr(settings, "ENVIRONMENT", environment)
+        app = FastAPI()
+        app.get("/")(lambda: {})
+        app.add_middleware(QueryStatsMiddleware)
+        return TestClient(app).get("/").headers
+
+    assert "server-timing" in headers_for("development")
+    assert "server-timing" not in headers_for("production")
@@ -0,0 +1,63 @@
+import asyncio
+from collections import namedtuple
+from types import SimpleNamespace
+
+from utils.search import KnowledgeSearchIndex
+
+Row = namedtuple("Row", ["id", "title", "method", "target", "description"])
+
+
+def knowledge(id, title):
+    return SimpleNamespace(id=id, title=title, method="メール", target="新規顧客", description="説明")
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+class CommitDuringSelect:
+    """SELECT の結果を返す前に、別のリクエストのコミット（during_select）が反映されるDB"""
+
+    def __init__(self, rows, during_select):
+        self.rows = rows
+        self.during_select = during_select
+
+    async def execute(self, statement):
+        self.during_select()
+        return FakeResult(self.rows)
+
+
+def ids(index, query):
+    return sorted(doc_id for doc_id, _ in index.search(query)[0])
+
+
+def test_changes_committed_during_build_are_kept():
+    index = KnowledgeSearchIndex()
+    rows = [Row(1, "営業メール", "メール", "新規顧客", "説明"), Row(2, "電話営業", "電話", "既存顧客", "説明")]
+
+    def during_select():
+        index.add(knowledge(3, "営業資料"))
+        index.add(knowledge(1, "提案書"))
+        index.remove(2)
+
+    asyncio.run(index.build(CommitDuringSelect(rows, during_select)))
+
+    assert index.is_built
+    assert ids(index, "営業") == [3]
+    assert ids(index, "提案") == [1]
+
+
+def test_invalidate_during_build_rebuilds_next_time():
+    index = KnowledgeSearchIndex()
+    rows = [Row(1, "営業メール", "メール", "新規顧客", "説明")]
+
+    asyncio.run(index.build(CommitDuringSelect(rows, index.invalidate)))
+    assert not index.is_built
+
+    asyncio.run(index.ensure_built(CommitDuringSelect(rows, lambda: None)))
+    assert index.is_built
+    assert ids(index, "営業") == [1]
@@ -0,0 +1,28 @@
+from models.unit_of_work import unit_of_work_metrics
+
+
+def test_read_only_request_does_not_commit(client, make_user, make_knowledge, query_budget):
+    author, headers = make_user()
+    knowledge, = make_knowledge(author)
+
+    with query_budget(10):
+        assert client.get("/knowledge/", headers=headers).status_code == 200
+        assert client.get(f"/knowledge/{knowledge.id}", headers=headers).status_code == 200
+    assert [stats.commits for _, _, stats in query_budget.requests] == [0, 0]
+
+
+def test_writing_request_commits_once(client, make_user):
+    _, headers = make_user()
+    before = unit_of_work_metrics.stats()
+
+    response = client.post(
+        "/knowledge/",
+        data={"title": "タイトル", "method": "メール", "target": "新規顧客", "description": "説明"},
+        files=[("files", ("a.txt", b"hello", "text/plain")), ("files", ("b.txt", b"world", "text/plain"))],
+        headers=headers,
+    )
+    assert response.status_code == 200
+    # ナレッジ・添付ファイル・経験値の書き込みを1回のコミットにまとめる（Blobの登録は別の接続で行う）
+    after = unit_of_work_metrics.stats()
+    assert after["requests"] - before["requests"] == 1
+    assert after["commits"] - before["commits"] == 1
@@ -0,0 +1,57 @@
+import asyncio
+
+from utils.view_counter import ViewCountBuffer
+
+
+class SlowBind:
+    """UPDATE に時間がかかるDB（完了した UPDATE の回数を数える）"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.flushed = 0
+        self.started = asyncio.Event()
+
+    def begin(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, statement):
+        self.started.set()
+        await asyncio.sleep(self.delay)
+        self.flushed += 1
+
+
+def test_stop_waits_for_a_flush_in_progress():
+    async def scenario():
+        buffer = ViewCountBuffer()
+        bind = SlowBind(delay=0.05)
+        buffer.increment(1, 3)
+        buffer.start(bind, interval=0)
+        await bind.started.wait()
+        # 反映中に終了しても、取り出した分は失われない
+        await buffer.stop()
+        return buffer, bind
+
+    buffer, bind = asyncio.run(scenario())
+    assert bind.flushed == 1
+    assert buffer.pending(1) == 0
+
+
+def test_cancelled_flush_puts_views_back():
+    async def scenario():
+        buffer = ViewCountBuffer()
+        bind = SlowBind(delay=1)
+        buffer.increment(1, 3)
+        task = asyncio.create_task(buffer.flush(bind))
+        await bind.started.wait()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        buffer.increment(1)
+        return buffer
+
+    assert asyncio.run(scenario()).pending(1) == 4
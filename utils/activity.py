@@ -0,0 +1,43 @@
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from models.user import User
+from models.user_activity import UserActivity
+
+# 経験値の台帳導入前の残高を引き継ぐ行（アクティビティ数には数えない）
+OPENING_BALANCE_ACTION = "opening_balance"
+
+
+def reconcile_activity_counts(db: Session) -> int:
+    """
+    users.activity_count を user_activities の実件数で作り直す
+
+    Returns:
+        int: 件数がずれていて修正したユーザー数
+    """
+    actual_count = (
+        select(func.count(UserActivity.id))
+        .where(UserActivity.user_id == User.id)
+        .where(UserActivity.action != OPENING_BALANCE_ACTION)
+        .correlate(User)
+        .scalar_subquery()
+    )
+    result = db.execute(
+        User.__table__.update()
+        .where(User.activity_count != actual_count)
+        .values(activity_count=actual_count, updated_at=User.updated_at)
+    )
+    db.commit()
+    return result.rowcount
+
+
+if __name__ == "__main__":
+    from models.database import SessionLocal
+    import models.knowledge, models.comment, models.file, models.profile  # noqa: F401  マッパー設定用
+
+    db = SessionLocal()
+    try:
+        fixed = reconcile_activity_counts(db)
+        print(f"✅ アクティビティ数を修正したユーザー数: {fixed}")
+    finally:
+        db.close()
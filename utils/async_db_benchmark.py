@@ -0,0 +1,129 @@
+"""
+非同期DBアクセスの負荷テスト
+
+async def のハンドラから同期セッションでクエリを実行する従来の方法（変更前）と、
+AsyncSession を使う方法（変更後）で、遅いクエリの処理中に来た軽いリクエストの応答時間を比較する。
+同期セッションではクエリの間イベントループが止まるため、軽いリクエストも遅いクエリを待たされる。
+既定では一時的なSQLiteデータベースを使う。--url で MySQL などのDBを指定できる（同期ドライバのURL）。
+
+    python -m utils.async_db_benchmark [--requests 500] [--rate 50] [--slow-ratio 0.2] [--url mysql+pymysql://...]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from models.database import ASYNC_DRIVERS
+
+# 遅いクエリ（50msかかるクエリ。SQLiteには同じ名前の関数を登録する）
+SLOW_QUERY = text("SELECT SLEEP(0.05)")
+FAST_QUERY = text("SELECT 1")
+
+
+def _register_sleep(dbapi_connection, connection_record):
+    dbapi_connection.create_function("SLEEP", 1, lambda seconds: time.sleep(seconds) or 0)
+
+
+def build_app(url: str) -> FastAPI:
+    sync_url = make_url(url)
+    async_url = sync_url.set(drivername=ASYNC_DRIVERS.get(sync_url.get_backend_name(), sync_url.drivername))
+
+    sync_engine = create_engine(sync_url, poolclass=QueuePool, pool_size=50, max_overflow=0)
+    async_engine = create_async_engine(async_url, poolclass=AsyncAdaptedQueuePool, pool_size=50, max_overflow=0)
+    if sync_url.get_backend_name() == "sqlite":
+        event.listen(sync_engine, "connect", _register_sleep)
+        event.listen(async_engine.sync_engine, "connect", _register_sleep)
+    app = FastAPI()
+
+    # 変更前: async def の中で同期セッションを使う
+    @app.get("/sync/{kind}")
+    async def sync_handler(kind: str):
+        with Session(sync_engine) as db:
+            return {"value": db.execute(SLOW_QUERY if kind == "slow" else FAST_QUERY).scalar()}
+
+    # 変更後: AsyncSession を使う
+    @app.get("/async/{kind}")
+    async def async_handler(kind: str):
+        async with AsyncSession(async_engine) as db:
+            return {"value": (await db.execute(SLOW_QUERY if kind == "slow" else FAST_QUERY)).scalar()}
+
+    app.state.engines = (sync_engine, async_engine)
+    return app
+
+
+async def load(app: FastAPI, mode: str, requests: int, rate: float, slow_ratio: float) -> Dict[str, List[float]]:
+    """
+    毎秒 rate 件の一定間隔でリクエストを送り、種類ごとの応答時間を返す
+
+    応答時間は送るはずだった時刻から数えるので、イベントループが止まって送信が遅れた分も含まれる。
+    """
+    latencies: Dict[str, List[float]] = {"slow": [], "fast": []}
+    slow_every = max(int(round(1 / slow_ratio)), 1) if slow_ratio > 0 else 0
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark") as client:
+        async def send(kind: str, scheduled_at: float):
+            response = await client.get(f"/{mode}/{kind}")
+            response.raise_for_status()
+            latencies[kind].append(time.perf_counter() - scheduled_at)
+
+        started_at = time.perf_counter()
+        tasks = []
+        for i in range(requests):
+            scheduled_at = started_at + i / rate
+            await asyncio.sleep(max(scheduled_at - time.perf_counter(), 0))
+            kind = "slow" if slow_every and i % slow_every == 0 else "fast"
+            tasks.append(asyncio.create_task(send(kind, scheduled_at)))
+        await asyncio.gather(*tasks)
+    return latencies
+
+
+def percentile(values: List[float], ratio: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * ratio), len(values) - 1)] * 1000
+
+
+async def run(url: str, requests: int, rate: float, slow_ratio: float) -> None:
+    app = build_app(url)
+    # 接続を作っておき、最初のリクエストに接続のコストが乗らないようにする
+    await load(app, "sync", 20, 1000, 0)
+    await load(app, "async", 20, 1000, 0)
+
+    print(f"リクエスト数 {requests}、毎秒 {rate:.0f} 件、遅いクエリ（50ms）の割合 {slow_ratio:.0%}")
+    print(f"{'方式':<8} {'軽い p50':>10} {'軽い p95':>10} {'軽い 最大':>10} {'遅い p50':>10} {'遅い p95':>10}  (ms)")
+    for mode, label in (("sync", "変更前"), ("async", "変更後")):
+        latencies = await load(app, mode, requests, rate, slow_ratio)
+        fast, slow = latencies["fast"], latencies["slow"]
+        print(
+            f"{label:<8} {percentile(fast, 0.5):>10.1f} {percentile(fast, 0.95):>10.1f} {max(fast) * 1000:>10.1f} "
+            f"{percentile(slow, 0.5) if slow else 0:>10.1f} {percentile(slow, 0.95) if slow else 0:>10.1f}"
+        )
+
+    sync_engine, async_engine = app.state.engines
+    sync_engine.dispose()
+    await async_engine.dispose()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="同期セッションと AsyncSession の同時リクエスト時の応答時間の比較")
+    parser.add_argument("--requests", type=int, default=500, help="送るリクエストの数")
+    parser.add_argument("--rate", type=float, default=50, help="1秒あたりに送るリクエストの数")
+    parser.add_argument("--slow-ratio", type=float, default=0.2, help="遅いクエリを実行するリクエストの割合")
+    parser.add_argument("--url", default=None, help="同期ドライバのDB URL（省略時は一時的なSQLite）")
+    args = parser.parse_args(argv)
+
+    url = args.url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "async_db_benchmark.db")
+    asyncio.run(run(url, args.requests, args.rate, args.slow_ratio))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import asyncio
+from collections import Counter
+from dataclasses import replace
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from fastapi import UploadFile
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from models.blob import Blob
+from models.file import File as FileModel
+from utils.blob_store import BlobStore, StoredBlob, stream_upload
+
+
+# 同じ内容の同時アップロードと回収が重なったときに登録をやり直す回数
+REGISTER_ATTEMPTS = 3
+
+
+async def _refresh_blob(bind: AsyncEngine, sha256: str) -> Optional[str]:
+    """
+    登録済みのBlobの updated_at を更新して回収対象から外し、保存先のキーを返す（なければ None）
+
+    スイーパーは updated_at が猶予期間より古い行だけを削除するので、同じ行への
+    この更新と削除はどちらか一方だけが成功する。更新できた場合は猶予期間の間は回収されない。
+    """
+    table = Blob.__table__
+    async with bind.begin() as connection:
+        result = await connection.execute(
+            table.update().where(table.c.sha256 == sha256).values(updated_at=datetime.utcnow())
+        )
+        if result.rowcount != 1:
+            return None
+        return await connection.scalar(select(table.c.storage_key).where(table.c.sha256 == sha256))
+
+
+async def _register_blob(bind: AsyncEngine, stored: StoredBlob) -> bool:
+    """
+    blobs に行を登録する（リクエストのトランザクションとは別に即コミットする）
+
+    本体の保存が終わってから呼ぶので、行があれば本体は必ず保存済みになっている。
+    行は ref_count=0 で作るため、この後のリクエストが失敗しても
+    猶予期間の後にスイーパーが回収できる。
+
+    Returns:
+        bool: 登録した場合 True、同じ内容の行が既にあった場合 False
+    """
+    now = datetime.utcnow()
+    try:
+        async with bind.begin() as connection:
+            await connection.execute(
+                Blob.__table__.insert().values(
+                    sha256=stored.sha256,
+                    size=stored.size,
+                    content_type=stored.content_type,
+                    storage_key=stored.key,
+                    ref_count=0,
+                    created_at=now,
+                    updated_at=now,
+                )
+            )
+        return True
+    except IntegrityError:
+        return False
+
+
+async def store_attachment(bind: AsyncEngine, store: BlobStore, upload: UploadFile) -> StoredBlob:
+    """
+    添付ファイルを内容のハッシュで保存する
+
+    同じ内容のファイルが既にあれば本体は保存し直さず、既存のものを参照する。
+    新しい内容の場合は本体をアップロードごとのキーに保存してから blobs に登録する。
+    参照数はまだ増やさないので、files に登録するときに retain_blobs() を呼ぶこと。
+    """
+    writer, stored = await stream_upload(store, upload)
+    try:
+        existing_key = await _refresh_blob(bind, stored.sha256)
+    except BaseException:
+        await run_in_threadpool(writer.abort)
+        raise
+    if existing_key is not None:
+        await run_in_threadpool(writer.abort)
+        return replace(stored, key=existing_key)
+
+    await run_in_threadpool(writer.commit, stored.key)
+    try:
+        for _ in range(REGISTER_ATTEMPTS):
+            if await _register_blob(bind, stored):
+                return stored
+            # 同じ内容が同時にアップロードされ、先に登録された（保存済みの本体を使う）
+            existing_key = await _refresh_blob(bind, stored.sha256)
+            if existing_key is not None:
+                await run_in_threadpool(store.delete, stored.key)
+                return replace(stored, key=existing_key)
+            # 先に登録された行がその間に回収された場合は登録し直す
+        raise RuntimeError("添付ファイルを登録できませんでした")
+    except BaseException:
+        await run_in_threadpool(store.delete, stored.key)
+        raise
+
+
+async def retain_blobs(db: AsyncSession, sha256s: Iterable[str]) -> None:
+    """Blobの参照数を使われる数だけ増やす（files の追加と同じトランザクションで呼ぶ）"""
+    now = datetime.utcnow()
+    for sha256, count in Counter(sha256s).items():
+        await db.execute(
+            Blob.__table__.update()
+            .where(Blob.sha256 == sha256)
+            .values(ref_count=Blob.ref_count + count, updated_at=now)
+        )
+
+
+async def release_attachments(db: AsyncSession, knowledge_id: int) -> None:
+    """
+    ナレッジの添付ファイルが参照しているBlobの参照数を減らす
+
+    本体の削除はスイーパーに任せる（ナレッジの削除と同じトランザクションで呼ぶ）。
+    """
+    result = await db.execute(
+        select(FileModel.sha256, func.count(FileModel.id))
+        .where(FileModel.knowledge_id == knowledge_id, FileModel.sha256.isnot(None))
+        .group_by(FileModel.sha256)
+    )
+    now = datetime.utcnow()
+    for sha256, count in result.all():
+        await db.execute(
+            Blob.__table__.update()
+            .where(Blob.sha256 == sha256)
+            .values(ref_count=Blob.ref_count - count, updated_at=now)
+        )
+
+
+async def sweep_orphaned_blobs(
+    bind: AsyncEngine,
+    store: BlobStore,
+    grace_seconds: float,
+    batch_size: int = 100,
+) -> int:
+    """
+    どこからも参照されなくなったBlobを削除する
+
+    アップロード中のBlobを消さないよう、最後の更新から grace_seconds 経ったものだけを対象にする。
+    先に行を消してから本体を消すので、途中で失敗しても参照の残ったBlobが消えることはない。
+    本体のキーはアップロードごとに異なるので、行を消した後に同じ内容がアップロードされても
+    新しい本体は別のキーに保存され、ここで消されることはない。
+
+    Returns:
+        int: 削除したBlob数
+    """
+    table = Blob.__table__
+    cutoff = datetime.utcnow() - timedelta(seconds=grace_seconds)
+    orphaned = (table.c.ref_count <= 0) & (table.c.updated_at < cutoff)
+
+    async with bind.connect() as connection:
+        rows = (await connection.execute(
+            select(table.c.sha256, table.c.storage_key).where(orphaned).limit(batch_size)
+        )).all()
+
+    deleted = 0
+    for sha256, storage_key in rows:
+        async with bind.begin() as connection:
+            # 確認してから削除するまでの間に参照された場合は消さない
+            result = await connection.execute(
+                table.delete().where(table.c.sha256 == sha256).where(orphaned)
+            )
+        if result.rowcount != 1:
+            continue
+        await run_in_threadpool(store.delete, storage_key)
+        deleted += 1
+    return deleted
+
+
+class BlobSweeper:
+    """参照されなくなったBlobを定期的に回収する"""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, bind: AsyncEngine, store: BlobStore, interval: float, grace_seconds: float) -> None:
+        """定期回収タスクを開始する（アプリ起動時に呼ぶ）"""
+        self._task = asyncio.create_task(self._run(bind, store, interval, grace_seconds))
+
+    async def stop(self) -> None:
+        """定期回収タスクを止める（アプリ終了時に呼ぶ）"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self, bind: AsyncEngine, store: BlobStore, interval: float, grace_seconds: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                deleted = await sweep_orphaned_blobs(bind, store, grace_seconds)
+                if deleted:
+                    print(f"✅ 参照されなくなった添付ファイルを削除しました: {deleted}件")
+            except Exception as e:
+                print(f"添付ファイルの回収エラー: {str(e)}")
+
+
+# アプリ全体で共有するスイーパー
+blob_sweeper = BlobSweeper()
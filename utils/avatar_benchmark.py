@@ -0,0 +1,153 @@
+"""
+アバター画像の分離ベンチマーク
+
+アバター画像（1枚あたり約256KB）を持つユーザーが多数いるSQLiteデータベースで、
+ユーザーを読み込む主な処理が発行するクエリ数と読み込むバイト数を計測し、
+どの処理も user_avatars（画像本体）を読まないことを確認する。
+
+    python -m utils.avatar_benchmark [ユーザー数]
+"""
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+from typing import List, Tuple
+
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import joinedload, selectinload, sessionmaker
+
+from core.principal_cache import CurrentUser
+from models.comment import Comment
+from models.database import Base
+from models.knowledge import Knowledge
+from models.user import User
+from models.user_avatar import UserAvatar
+import models.file, models.blob, models.profile, models.user_activity  # noqa: F401  マッパー設定用
+from utils.leaderboard import Leaderboard
+
+AVATAR_SIZE = 256 * 1024
+
+
+def seed(db_path: str, user_count: int) -> None:
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    rng = random.Random(0)
+    avatar = rng.randbytes(AVATAR_SIZE)
+    db.execute(
+        User.__table__.insert(),
+        [
+            {
+                "email": f"user{i}@example.com",
+                "username": f"user{i}",
+                "level": rng.randint(1, 50),
+                "experience_points": rng.randint(0, 5000),
+                "points": rng.randint(0, 10000),
+                "avatar_content_type": "image/png",
+                "avatar_etag": f"{i:064x}",
+            }
+            for i in range(1, user_count + 1)
+        ],
+    )
+    db.execute(
+        UserAvatar.__table__.insert(),
+        [
+            {"user_id": i, "variant": "original", "content_type": "image/png", "data": avatar, "etag": f"{i:064x}"}
+            for i in range(1, user_count + 1)
+        ],
+    )
+    for i in range(1, 101):
+        knowledge = Knowledge(title=f"ナレッジ {i}", method="メール", target="新規顧客", author_id=rng.randint(1, user_count))
+        db.add(knowledge)
+        db.flush()
+        db.add(Comment(knowledge_id=knowledge.id, content="参考になりました", author_id=rng.randint(1, user_count)))
+    db.commit()
+    db.close()
+    engine.dispose()
+
+
+def bytes_read(db_path: str, statements: List[Tuple[str, tuple]]) -> int:
+    """記録したクエリを実行し直して、結果のバイト数を数える"""
+    connection = sqlite3.connect(db_path)
+    total = 0
+    try:
+        for sql, params in statements:
+            for row in connection.execute(sql, params):
+                for value in row:
+                    if isinstance(value, (bytes, str)):
+                        total += len(value)
+                    elif value is not None:
+                        total += 8
+    finally:
+        connection.close()
+    return total
+
+
+async def measure(db_path: str) -> bool:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    statements: List[Tuple[str, tuple]] = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, tuple(parameters or ())))
+
+    async def current_user(db):
+        return await CurrentUser.fetch(db, "user1@example.com")
+
+    async def load_user(db):
+        principal = await CurrentUser.fetch(db, "user1@example.com")
+        return await principal.load(db)
+
+    async def knowledge_list(db):
+        return (await db.execute(
+            select(Knowledge).options(selectinload(Knowledge.author))
+            .order_by(Knowledge.created_at.desc(), Knowledge.id.desc()).limit(20)
+        )).scalars().all()
+
+    async def comment_list(db):
+        return (await db.execute(
+            select(Comment).options(joinedload(Comment.author)).limit(50)
+        )).scalars().all()
+
+    async def leaderboard_rebuild(db):
+        await Leaderboard().rebuild(db)
+
+    cases = [
+        ("get_current_user", current_user),
+        ("current_user.load (ORMのUser)", load_user),
+        ("ナレッジ一覧（著者20件）", knowledge_list),
+        ("コメント一覧（著者50件）", comment_list),
+        ("ランキング構築（全ユーザー）", leaderboard_rebuild),
+    ]
+
+    ok = True
+    print(f"{'処理':<32} {'クエリ数':>8} {'読み込みバイト':>14}  画像を読んだか")
+    for label, case in cases:
+        statements.clear()
+        async with AsyncSession(engine) as db:
+            await case(db)
+        touched = any("user_avatars" in sql for sql, _ in statements)
+        ok = ok and not touched
+        print(f"{label:<32} {len(statements):>8} {bytes_read(db_path, statements):>14}  {'はい' if touched else 'いいえ'}")
+    await engine.dispose()
+
+    print(f"\n参考: 1ユーザーあたりの画像サイズ {AVATAR_SIZE} バイト"
+          "（users に画像を持っていた構成では、ユーザーを読み込むたびにこの分が加わっていた）")
+    return ok
+
+
+def run(user_count: int = 1000) -> None:
+    db_path = os.path.join(tempfile.mkdtemp(), "avatar_benchmark.db")
+    seed(db_path, user_count)
+    print(f"ユーザー数: {user_count}\n")
+    if not asyncio.run(measure(db_path)):
+        print("❌ ユーザーの読み込みで画像本体を読んでいる処理があります")
+        sys.exit(1)
+    print("✅ ユーザーの読み込みで画像本体は読まれていません")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
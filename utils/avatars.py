@@ -0,0 +1,136 @@
+import hashlib
+import io
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from models.user import User
+from models.user_avatar import UserAvatar
+
+# アップロードされた画像そのもの
+ORIGINAL = "original"
+
+# アップロードを受け付ける画像形式（SVGはスクリプトを含められるので受け付けない）
+AVATAR_CONTENT_TYPES = ("image/png", "image/jpeg", "image/gif", "image/webp")
+
+# 配信時に付けるヘッダー（宣言したMIMEタイプ以外として解釈させない）
+AVATAR_RESPONSE_HEADERS = {"X-Content-Type-Options": "nosniff"}
+
+# 縮小版の一辺の最大ピクセル数
+VARIANT_SIZES = {
+    "small": 64,    # ランキング・コメントなどの一覧用
+    "medium": 256,  # プロフィール画面用
+}
+
+
+def make_variants(data: bytes) -> Dict[str, Tuple[bytes, str]]:
+    """
+    アバター画像の縮小版を作る
+
+    Returns:
+        Dict[str, Tuple[bytes, str]]: バリアント名 → (画像データ, MIMEタイプ)。
+        Pillowがない場合や画像として読めない場合は空（元画像をそのまま配信する）
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        print("⚠️ Pillowがインストールされていないため、アバターの縮小版を作成しません")
+        return {}
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+            has_alpha = image.mode in ("RGBA", "LA", "P")
+            source = image.convert("RGBA" if has_alpha else "RGB")
+    except Exception as e:
+        print(f"アバター画像の読み込みエラー: {str(e)}")
+        return {}
+
+    variants = {}
+    for variant, max_size in VARIANT_SIZES.items():
+        resized = source.copy()
+        resized.thumbnail((max_size, max_size))
+        buffer = io.BytesIO()
+        if has_alpha:
+            resized.save(buffer, format="PNG", optimize=True)
+            variants[variant] = (buffer.getvalue(), "image/png")
+        else:
+            resized.save(buffer, format="JPEG", quality=85, optimize=True)
+            variants[variant] = (buffer.getvalue(), "image/jpeg")
+    return variants
+
+
+def served_content_type(content_type: Optional[str]) -> str:
+    """配信時のMIMEタイプ（制限を入れる前に保存された、受け付けない形式の画像はブラウザに表示させない）"""
+    return content_type if content_type in AVATAR_CONTENT_TYPES else "application/octet-stream"
+
+
+def _variant_rows(user_id: int, data: bytes) -> List[UserAvatar]:
+    return [
+        UserAvatar(
+            user_id=user_id,
+            variant=variant,
+            content_type=content_type,
+            data=variant_data,
+            etag=hashlib.sha256(variant_data).hexdigest(),
+        )
+        for variant, (variant_data, content_type) in make_variants(data).items()
+    ]
+
+
+async def save_avatar(db: AsyncSession, user: User, data: bytes, content_type: str) -> None:
+    """
+    アバター画像を保存し、縮小版を作り直す（コミットは呼び出し側で行う）
+
+    画像は user_avatars に保存し、users にはMIMEタイプとハッシュだけを持たせる。
+    """
+    etag = hashlib.sha256(data).hexdigest()
+    user.avatar_content_type = content_type
+    user.avatar_etag = etag
+
+    # 画像の縮小はCPUを使うのでスレッドプールで行う
+    rows = await run_in_threadpool(_variant_rows, user.id, data)
+    rows.append(UserAvatar(user_id=user.id, variant=ORIGINAL, content_type=content_type, data=data, etag=etag))
+    await db.execute(delete(UserAvatar).where(UserAvatar.user_id == user.id))
+    db.add_all(rows)
+
+
+def backfill_variants(db: Session) -> int:
+    """
+    縮小版がまだないアバターについて縮小版を作る（導入前にアップロードされた画像用）
+
+    Returns:
+        int: 縮小版を作ったユーザー数
+    """
+    has_variants = select(UserAvatar.user_id).where(UserAvatar.variant != ORIGINAL).distinct()
+    user_ids = db.scalars(
+        select(UserAvatar.user_id).where(
+            UserAvatar.variant == ORIGINAL, UserAvatar.user_id.notin_(has_variants)
+        )
+    ).all()
+    created = 0
+    for user_id in user_ids:
+        data: Optional[bytes] = db.scalar(
+            select(UserAvatar.data).where(UserAvatar.user_id == user_id, UserAvatar.variant == ORIGINAL)
+        )
+        rows = _variant_rows(user_id, data) if data else []
+        if rows:
+            db.add_all(rows)
+            db.commit()
+            created += 1
+    return created
+
+
+if __name__ == "__main__":
+    from models.database import SessionLocal
+    import models.knowledge, models.comment, models.file, models.blob, models.profile, models.user_activity  # noqa: F401  マッパー設定用
+
+    db = SessionLocal()
+    try:
+        created = backfill_variants(db)
+        print(f"✅ アバターの縮小版を作成したユーザー数: {created}")
+    finally:
+        db.close()
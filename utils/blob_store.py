@@ -0,0 +1,218 @@
+import hashlib
+import os
+import tempfile
+import uuid
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from core.config import settings
+
+# アップロードを読み込む単位（1リクエストあたりのメモリ使用量はこのサイズ程度に収まる）
+CHUNK_SIZE = 1024 * 1024
+
+# Azureへ送る前に一時ファイルへ書き出す閾値（これを超えるとディスクに退避する）
+SPOOL_MAX_MEMORY = 4 * 1024 * 1024
+
+
+@dataclass
+class StoredBlob:
+    """保存したファイルのメタデータ"""
+    key: str
+    size: int
+    sha256: str
+    content_type: Optional[str]
+
+
+class BlobWriter:
+    """チャンク単位で書き込み、最後に commit() でキーを確定する"""
+
+    def write(self, chunk: bytes) -> None:
+        raise NotImplementedError
+
+    def commit(self, key: str) -> None:
+        raise NotImplementedError
+
+    def abort(self) -> None:
+        raise NotImplementedError
+
+
+class BlobStore:
+    """ファイル本体の保存先"""
+
+    def open_writer(self, content_type: Optional[str] = None) -> BlobWriter:
+        raise NotImplementedError
+
+    def iter_range(self, key: str, start: int, length: int) -> Iterator[bytes]:
+        """start バイト目から length バイトをチャンク単位で読み出す"""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+
+class LocalBlobWriter(BlobWriter):
+    def __init__(self, root: str):
+        self._root = root
+        tmp_dir = os.path.join(root, ".tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        self._file = tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False)
+
+    def write(self, chunk: bytes) -> None:
+        self._file.write(chunk)
+
+    def commit(self, key: str) -> None:
+        self._file.close()
+        path = os.path.join(self._root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(self._file.name, path)
+
+    def abort(self) -> None:
+        self._file.close()
+        if os.path.exists(self._file.name):
+            os.unlink(self._file.name)
+
+
+class LocalBlobStore(BlobStore):
+    """ローカルファイルシステムに保存する（開発環境用）"""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def open_writer(self, content_type: Optional[str] = None) -> BlobWriter:
+        return LocalBlobWriter(self.root)
+
+    def iter_range(self, key: str, start: int, length: int) -> Iterator[bytes]:
+        with open(self.path(key), "rb") as f:
+            f.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def delete(self, key: str) -> None:
+        try:
+            os.unlink(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+class AzureBlobWriter(BlobWriter):
+    def __init__(self, container_client, content_type: Optional[str]):
+        self._container = container_client
+        self._content_type = content_type
+        self._spool: BinaryIO = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+        self._size = 0
+
+    def write(self, chunk: bytes) -> None:
+        self._spool.write(chunk)
+        self._size += len(chunk)
+
+    def commit(self, key: str) -> None:
+        from azure.storage.blob import ContentSettings
+
+        self._spool.seek(0)
+        try:
+            self._container.upload_blob(
+                name=key,
+                data=self._spool,
+                length=self._size,
+                overwrite=True,
+                content_settings=ContentSettings(content_type=self._content_type),
+            )
+        finally:
+            self._spool.close()
+
+    def abort(self) -> None:
+        self._spool.close()
+
+
+class AzureBlobStore(BlobStore):
+    """Azure Blob Storage に保存する"""
+
+    def __init__(self, connection_string: str, container_name: str):
+        try:
+            from azure.storage.blob import BlobServiceClient
+        except ImportError:
+            raise RuntimeError("Azure Blob Storage を使うには azure-storage-blob をインストールしてください")
+        service = BlobServiceClient.from_connection_string(connection_string)
+        self.container = service.get_container_client(container_name)
+
+    def open_writer(self, content_type: Optional[str] = None) -> BlobWriter:
+        return AzureBlobWriter(self.container, content_type)
+
+    def iter_range(self, key: str, start: int, length: int) -> Iterator[bytes]:
+        if length <= 0:
+            return
+        downloader = self.container.download_blob(
+            key, offset=start, length=length, max_concurrency=1
+        )
+        yield from downloader.chunks()
+
+    def delete(self, key: str) -> None:
+        from azure.core.exceptions import ResourceNotFoundError
+
+        try:
+            self.container.delete_blob(key)
+        except ResourceNotFoundError:
+            pass
+
+
+@lru_cache
+def get_blob_store() -> BlobStore:
+    """設定（BLOB_STORE_BACKEND）に応じた保存先を返す"""
+    if settings.BLOB_STORE_BACKEND == "azure":
+        return AzureBlobStore(
+            settings.AZURE_STORAGE_CONNECTION_STRING,
+            settings.AZURE_STORAGE_CONTAINER_NAME,
+        )
+    return LocalBlobStore(settings.LOCAL_BLOB_STORE_PATH)
+
+
+def upload_key(sha256: str) -> str:
+    """
+    保存先のキーを決める（内容のハッシュにアップロードごとの乱数を付ける）
+
+    同じ内容でもアップロードごとに別のキーにするので、スイーパーが回収中の本体と
+    同じキーへ書き込んでしまうことがない。
+    """
+    return f"blobs/{sha256[:2]}/{sha256}-{uuid.uuid4().hex}"
+
+
+async def stream_upload(store: BlobStore, upload: UploadFile) -> Tuple[BlobWriter, StoredBlob]:
+    """
+    アップロードファイルをチャンク単位で保存先へ流し込む
+
+    全体をメモリに載せず、読み込みながらサイズとSHA-256を計算する。
+    返した writer はまだ確定していないので、呼び出し側で commit() か abort() すること。
+    """
+    writer = store.open_writer(upload.content_type)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        while True:
+            chunk = await upload.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+            await run_in_threadpool(writer.write, chunk)
+    except BaseException:
+        await run_in_threadpool(writer.abort)
+        raise
+    sha256 = digest.hexdigest()
+    return writer, StoredBlob(
+        key=upload_key(sha256),
+        size=size,
+        sha256=sha256,
+        content_type=upload.content_type,
+    )
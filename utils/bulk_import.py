@@ -0,0 +1,197 @@
+import json
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.knowledge import Knowledge
+from models.user import User
+from utils.experience import grant_experience
+
+# 1回の INSERT（executemany）で送る行数
+BATCH_SIZE = 500
+
+# 1行の最大バイト数（これを超える行はエラーにして読み飛ばす）
+MAX_LINE_BYTES = 1024 * 1024
+
+# レスポンスに含めるエラーの最大件数（件数は全て数える）
+MAX_REPORTED_ERRORS = 1000
+
+# ナレッジ1件あたりの経験値（POST /knowledge/ と同じ）
+XP_PER_KNOWLEDGE = 10
+
+REQUIRED_FIELDS = ("title", "method", "target")
+STRING_LIMITS = {"title": 255, "category": 100}
+
+
+class LineError(ValueError):
+    pass
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Optional[bytes]]:
+    """
+    受信中のボディを1行ずつ返す（長すぎる行は None）
+
+    保持するのは読みかけの1行だけなので、ボディ全体の大きさに関係なくメモリ使用量は一定。
+    """
+    buffer = bytearray()
+    too_long = False
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            part = chunk[start:] if end == -1 else chunk[start:end]
+            if not too_long:
+                buffer += part
+                if len(buffer) > MAX_LINE_BYTES:
+                    too_long = True
+                    buffer.clear()
+            if end == -1:
+                break
+            yield None if too_long else bytes(buffer)
+            buffer.clear()
+            too_long = False
+            start = end + 1
+    if too_long:
+        yield None
+    elif buffer:
+        yield bytes(buffer)
+
+
+def parse_line(line: Optional[bytes]) -> Dict[str, Any]:
+    """1行のJSONをナレッジの行に変換する（author_email は後で解決する）"""
+    if line is None:
+        raise LineError(f"1行が{MAX_LINE_BYTES}バイトを超えています")
+    try:
+        data = json.loads(line)
+    except ValueError as e:
+        raise LineError(f"JSONとして読み込めません: {str(e)}")
+    if not isinstance(data, dict):
+        raise LineError("1行に1つのJSONオブジェクトを指定してください")
+
+    row = {}
+    for field in ("title", "method", "target", "description", "category", "author_email"):
+        value = data.get(field)
+        if value is None:
+            if field in REQUIRED_FIELDS:
+                raise LineError(f"{field} は必須です")
+            continue
+        if not isinstance(value, str):
+            raise LineError(f"{field} は文字列で指定してください")
+        if field in REQUIRED_FIELDS and not value.strip():
+            raise LineError(f"{field} は必須です")
+        limit = STRING_LIMITS.get(field)
+        if limit and len(value) > limit:
+            raise LineError(f"{field} は{limit}文字以内で指定してください")
+        row[field] = value
+
+    created_at = data.get("created_at")
+    if created_at is not None:
+        try:
+            row["created_at"] = datetime.fromisoformat(str(created_at).replace("Z", "+00:00")).replace(tzinfo=None)
+        except ValueError:
+            raise LineError("created_at はISO 8601形式で指定してください")
+        row["updated_at"] = row["created_at"]
+    return row
+
+
+class BulkImporter:
+    """
+    NDJSONのナレッジを BATCH_SIZE 行ずつまとめて INSERT する
+
+    経験値は INSERT した行の分だけバッチごとに台帳へ記録し、同じコミットで著者ごとに加算する。
+    保持するのは著者ごとの結果だけなので、行数が多くてもメモリ使用量は増えない。
+    """
+
+    def __init__(self, db: AsyncSession, default_author_id: int):
+        self.db = db
+        self.default_author_id = default_author_id
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        self._batch: List[Tuple[int, Dict[str, Any]]] = []
+        self._author_ids: Dict[str, Optional[int]] = {}
+        self.experience: Dict[int, Dict[str, Any]] = {}
+
+    async def run(self, chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+        started_at = time.perf_counter()
+        line_number = 0
+        async for line in iter_lines(chunks):
+            line_number += 1
+            if line is not None and not line.strip():
+                continue
+            try:
+                row = parse_line(line)
+                row["author_id"] = await self._resolve_author(row.pop("author_email", None))
+            except LineError as e:
+                self._error(line_number, str(e))
+                continue
+            self._batch.append((line_number, row))
+            if len(self._batch) >= BATCH_SIZE:
+                await self._flush()
+        await self._flush()
+
+        elapsed = time.perf_counter() - started_at
+        return {
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errorsTruncated": self.failed > len(self.errors),
+            "experience": self.experience,
+            "elapsedSeconds": round(elapsed, 3),
+            "rowsPerSecond": round(self.inserted / elapsed, 1) if elapsed > 0 else None,
+        }
+
+    async def _resolve_author(self, email: Optional[str]) -> int:
+        if email is None:
+            return self.default_author_id
+        if email not in self._author_ids:
+            self._author_ids[email] = await self.db.scalar(select(User.id).where(User.email == email))
+        author_id = self._author_ids[email]
+        if author_id is None:
+            raise LineError(f"ユーザーが見つかりません: {email}")
+        return author_id
+
+    async def _flush(self) -> None:
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, []
+        try:
+            await self.db.execute(insert(Knowledge), [row for _, row in batch])
+            inserted = batch
+        except Exception:
+            # どの行が原因か分かるよう、1行ずつセーブポイントの中で入れ直す
+            # （入れられた行と経験値は、下でまとめて1回だけコミットする）
+            await self.db.rollback()
+            inserted = []
+            for line_number, row in batch:
+                try:
+                    async with self.db.begin_nested():
+                        await self.db.execute(insert(Knowledge), [row])
+                    inserted.append((line_number, row))
+                except Exception as e:
+                    self._error(line_number, f"登録に失敗しました: {str(e)}")
+        self.inserted += len(inserted)
+        await self._grant_experience(row["author_id"] for _, row in inserted)
+        await self.db.commit()
+
+    async def _grant_experience(self, author_ids: Iterable[int]) -> None:
+        # 1件ごとに台帳へ記録し、合計とレベルはバッチ内の著者ごとに1回で更新する
+        results = await grant_experience(
+            self.db,
+            ((author_id, "create_knowledge", XP_PER_KNOWLEDGE) for author_id in author_ids),
+        )
+        # 著者ごとに、最初のバッチの加算前から最後のバッチの加算後までの結果にまとめる
+        for author_id, result in results.items():
+            first = self.experience.get(author_id)
+            if first is not None:
+                result = {**result, "before_level": first["before_level"], "before_xp": first["before_xp"]}
+                result["level_up"] = result["after_level"] > result["before_level"]
+            self.experience[author_id] = result
+
+    def _error(self, line_number: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_number, "error": message})
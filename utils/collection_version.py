@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.collection_version import CollectionVersion
+
+# ナレッジ一覧の版
+KNOWLEDGE_LIST = "knowledges"
+
+
+async def bump_collection_version(db: AsyncSession, name: str) -> None:
+    """
+    一覧の版を1つ進める
+
+    変更と同じトランザクションで呼ぶこと（コミットは呼び出し側で行う）。
+    行はマイグレーションで作るが、ない場合（テスト用のDBなど）はここで作る。
+    """
+    now = datetime.utcnow()
+    result = await db.execute(
+        update(CollectionVersion)
+        .where(CollectionVersion.name == name)
+        .values(version=CollectionVersion.version + 1, updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        db.add(CollectionVersion(name=name, version=1, updated_at=now))
+        await db.flush()
@@ -0,0 +1,33 @@
+from typing import List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from models.comment import Comment
+from utils.pagination import decode_cursor
+
+
+async def fetch_comments(db: AsyncSession, knowledge_id: int, cursor: Optional[str], limit: int) -> List[Comment]:
+    """
+    ナレッジのコメントを古い順に limit 件取得する
+
+    カーソル指定時は (created_at, id) より新しい行から取得する（キーセットページング）。
+    投稿者は selectinload で1回のクエリにまとめて読み込む。
+    """
+    query = (
+        select(Comment)
+        .options(selectinload(Comment.author))
+        .where(Comment.knowledge_id == knowledge_id)
+    )
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        query = query.where(
+            (Comment.created_at > cursor_created_at) |
+            ((Comment.created_at == cursor_created_at) & (Comment.id > cursor_id))
+        )
+    return (
+        await db.execute(
+            query.order_by(Comment.created_at.asc(), Comment.id.asc()).limit(limit)
+        )
+    ).scalars().all()
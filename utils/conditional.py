@@ -0,0 +1,75 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+# 条件付きGETで返すレスポンスのキャッシュ指定（保存はしてよいが、使う前に再検証させる）
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match の値が ETag に一致するか（弱いETagも同じものとみなす）"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    if etag.startswith("W/"):
+        etag = etag[2:]
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def make_etag(*parts) -> str:
+    """バージョンを表す値から弱いETagを作る（本文のバイト列ではなく内容の版を表すため）"""
+    version = "|".join("" if part is None else str(part) for part in parts)
+    return f'W/"{hashlib.sha1(version.encode("utf-8")).hexdigest()}"'
+
+
+def http_date(value: datetime) -> str:
+    """DBの日時（UTC・タイムゾーンなし）をHTTPの日付形式にする"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.replace(microsecond=0), usegmt=True)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """
+    If-None-Match / If-Modified-Since から304を返してよいか判定する
+
+    If-None-Match がある場合は If-Modified-Since を見ない（RFC 9110）。
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    modified = last_modified if last_modified.tzinfo else last_modified.replace(tzinfo=timezone.utc)
+    return modified.replace(microsecond=0) <= since
+
+
+def set_validators(response: Response, etag: str, last_modified: Optional[datetime]) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = REVALIDATE_CACHE_CONTROL
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
+
+
+def not_modified(etag: str, last_modified: Optional[datetime]) -> Response:
+    response = Response(status_code=304)
+    set_validators(response, etag, last_modified)
+    return response
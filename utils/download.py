@@ -0,0 +1,114 @@
+import re
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+
+from utils.blob_store import BlobStore
+from utils.conditional import etag_matches
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Range ヘッダー（単一範囲のみ）を解釈する
+
+    Returns:
+        Optional[Tuple[int, int]]: 先頭と末尾のバイト位置（末尾を含む）。範囲指定なしは None
+
+    Raises:
+        HTTPException: 範囲がファイルの外にある場合（416）
+    """
+    if not header or size == 0:
+        return None
+    match = _RANGE_PATTERN.match(header.strip())
+    if not match:
+        # 解釈できない形式や複数範囲の指定は無視してファイル全体を返す
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-500 は末尾500バイト
+        length = int(last)
+        if length == 0:
+            raise range_not_satisfiable(size)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise range_not_satisfiable(size)
+    return start, min(end, size - 1)
+
+
+def range_not_satisfiable(size: int) -> HTTPException:
+    return HTTPException(
+        status_code=416,
+        detail="指定された範囲はファイルの外です",
+        headers={"Content-Range": f"bytes */{size}"},
+    )
+
+
+def if_range_matches(header: str, etag: str) -> bool:
+    """If-Range の値が ETag に一致するか（強い比較。弱いETagや日付は一致しないものとして扱う）"""
+    candidate = header.strip()
+    return not candidate.startswith("W/") and not etag.startswith("W/") and candidate == etag
+
+
+def content_disposition(filename: str) -> str:
+    """日本語のファイル名でも崩れないよう RFC 5987 形式を併記する"""
+    fallback = filename.encode("ascii", "replace").decode("ascii").replace('"', "_")
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
+
+
+def blob_response(
+    request: Request,
+    store: BlobStore,
+    key: str,
+    size: int,
+    etag: str,
+    content_type: Optional[str],
+    filename: str,
+) -> Response:
+    """
+    Blobストアのファイルを返すレスポンスを作る
+
+    ETag が一致すれば 304、Range があれば 206 で該当範囲だけを返す。
+    本体はチャンク単位で読み出して送るので、ワーカーのメモリにファイル全体は載らない。
+    """
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        # 閲覧権限を毎回確認するため、保存はしてもよいが使う前に再検証させる
+        "Cache-Control": "private, no-cache",
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range is not None and not if_range_matches(if_range, etag):
+        # 手元のファイルが古い場合は Range を無視して全体を返す（範囲外でも416にしない）
+        range_header = None
+    byte_range = parse_range(range_header, size)
+
+    headers["Content-Disposition"] = content_disposition(filename)
+    media_type = content_type or "application/octet-stream"
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(
+            store.iter_range(key, 0, size), media_type=media_type, headers=headers
+        )
+
+    start, end = byte_range
+    length = end - start + 1
+    headers["Content-Length"] = str(length)
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return StreamingResponse(
+        store.iter_range(key, start, length),
+        status_code=206,
+        media_type=media_type,
+        headers=headers,
+    )
@@ -1,19 +1,147 @@
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Tuple
+
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+
 from models.user import User
-from typing import Tuple, Dict, Any
+from models.user_activity import UserActivity
+from models.unit_of_work import after_commit
+from core.principal_cache import SNAPSHOT_COLUMNS, CurrentUser
+from core.security import principal_cache
+from utils.leaderboard import leaderboard
+from utils.level_curve import level_curve
+from utils.response_cache import response_cache
+
+# 台帳（user_activities）へ1回の INSERT（executemany）で書き込む行数
+LEDGER_BATCH_SIZE = 500
+
+
+async def _increment(db: AsyncSession, user_id: int, xp: int, events: int):
+    """
+    経験値・ポイント・アクティビティ数を1回の UPDATE で加算し、加算後の行を返す
+
+    読み込んだ値に足して書き戻すのではなく current_xp = current_xp + :xp の形で加算するので、
+    同じユーザーへの同時の加算が失われない。RETURNING が使えるDBでは UPDATE の結果から、
+    使えないDB（MySQL）では同じトランザクション内でロック済みの行を読み直して返す。
+    """
+    table = User.__table__
+    stmt = (
+        table.update()
+        .where(table.c.id == user_id)
+        .values(
+            current_xp=func.coalesce(table.c.current_xp, 0) + xp,
+            points=func.coalesce(table.c.points, 0) + xp,
+            activity_count=table.c.activity_count + events,
+            # プロフィールの変更ではないので updated_at は変えない（ナレッジ詳細の ETag に含まれるため）
+            updated_at=table.c.updated_at,
+        )
+    )
+    if db.bind.dialect.update_returning:
+        return (await db.execute(stmt.returning(*SNAPSHOT_COLUMNS))).first()
+    await db.execute(stmt)
+    return (await db.execute(select(*SNAPSHOT_COLUMNS).where(User.id == user_id))).first()
+
 
-def add_experience(user: User, xp: int, db: Session) -> Dict[str, Any]:
+async def grant_experience(db: AsyncSession, awards: Iterable[Tuple[int, str, int]]) -> Dict[int, Dict[str, Any]]:
+    """
+    経験値の付与を台帳に記録し、ユーザーごとの合計とレベルをまとめて更新する
+
+    Args:
+        db (AsyncSession): データベースセッション
+        awards: (user_id, action, xp) の並び。1件ごとに user_activities に1行記録する
+
+    Returns:
+        Dict[int, Dict[str, Any]]: ユーザーIDごとの add_experience と同じ形式の結果
+
+    Note:
+        - 台帳は LEDGER_BATCH_SIZE 行ずつまとめて INSERT する
+        - current_xp / points / activity_count はユーザーごとに1回の相対 UPDATE で加算する
+        - レベルアップの判定は UPDATE が返した加算後の値から level_curve で行う
+        - コミットは呼び出し側で行う（ランキング等のキャッシュはコミット後に更新する）
+    """
+    now = datetime.utcnow()
+    ledger = [
+        {"user_id": user_id, "action": action, "xp_amount": xp, "timestamp": now}
+        for user_id, action, xp in awards
+    ]
+    xp_by_user: Counter = Counter()
+    events_by_user: Counter = Counter()
+    for row in ledger:
+        xp_by_user[row["user_id"]] += row["xp_amount"]
+        events_by_user[row["user_id"]] += 1
+    if not ledger:
+        return {}
+
+    # ロックの取得順をそろえてデッドロックを避けるため、ユーザーID順に加算する
+    results = {}
+    snapshots = []
+    for user_id in sorted(xp_by_user):
+        xp = xp_by_user[user_id]
+        row = await _increment(db, user_id, xp, events_by_user[user_id])
+        if row is None:
+            continue
+        # 加算後の累積経験値から、加算前後のレベルを求める（ほかのリクエストの加算も含んだ値）
+        total_xp = (row.experience_points or 0) + (row.current_xp or 0)
+        before = level_curve.state(total_xp - xp)
+        after = level_curve.state(total_xp)
+        if (row.level, row.current_xp, row.experience_points) != (
+            after.level, after.current_xp, after.experience_points
+        ):
+            # 行はこのトランザクションがロックしているので、加算後の値から求めた値で上書きしてよい
+            await db.execute(
+                update(User.__table__)
+                .where(User.__table__.c.id == user_id)
+                .values(
+                    level=after.level,
+                    current_xp=after.current_xp,
+                    experience_points=after.experience_points,
+                    updated_at=User.__table__.c.updated_at,
+                )
+            )
+        snapshot = CurrentUser.from_row(row)
+        snapshot.level = after.level
+        snapshot.current_xp = after.current_xp
+        snapshot.experience_points = after.experience_points
+        snapshots.append(snapshot)
+        results[user_id] = {
+            "level_up": after.level > before.level,
+            "before_level": before.level,
+            "before_xp": before.current_xp,
+            "after_level": after.level,
+            "after_xp": after.current_xp,
+            "required_xp": after.required_xp
+        }
+
+    # 台帳は加算の後に書く（外部キーの確認で先に共有ロックを取ると、同時の加算どうしでデッドロックする）
+    for start in range(0, len(ledger), LEDGER_BATCH_SIZE):
+        await db.execute(insert(UserActivity), ledger[start:start + LEDGER_BATCH_SIZE])
+
+    def refresh_caches() -> None:
+        for snapshot in snapshots:
+            principal_cache.invalidate(snapshot.email)
+            leaderboard.update(snapshot)
+        response_cache.invalidate("ranking:*")
+
+    after_commit(db, refresh_caches)
+    return results
+
+
+async def add_experience(user_id: int, xp: int, db: AsyncSession, action: str = "create_knowledge") -> Dict[str, Any]:
     """
     ユーザーに経験値を追加し、レベルアップの処理を行う
 
     Args:
-        user (User): 経験値を追加するユーザー
+        user_id (int): 経験値を追加するユーザーのID
         xp (int): 追加する経験値
-        db (Session): データベースセッション
+        db (AsyncSession): データベースセッション
+        action (str): 台帳に記録する操作の種類
 
     Returns:
-        Dict[str, Any]: 
-            - leveled_up (bool): レベルアップしたかどうか
+        Dict[str, Any]:
+            - level_up (bool): レベルアップしたかどうか
             - before_level (int): 追加前のレベル
             - before_xp (int): 追加前の経験値
             - after_level (int): 追加後のレベル
@@ -21,38 +149,64 @@ def add_experience(user: User, xp: int, db: Session) -> Dict[str, Any]:
             - required_xp (int): 次のレベルに必要な経験値
 
     Note:
-        - current_xpに経験値を加算
-        - pointsに経験値を加算
-        - レベルアップに必要な経験値に達した場合、レベルアップ処理を実行
-        - レベルアップ後の必要経験値は 100
-        - レベルアップした場合、experience_pointsに満たしたrequired_expを追加
-    """
-    # 経験値追加前のレベルと経験値を記録
-    before_level = user.level
-    before_xp = user.current_xp
-    
-    user.current_xp += xp
-    required_xp = 100
-    
-    leveled_up = False
-    earned_required_xp = 0
-    
-    while user.current_xp >= required_xp:
-        user.current_xp -= required_xp
-        user.level += 1
-        leveled_up = True
-        earned_required_xp += required_xp
-    
-    if leveled_up:
-        user.experience_points += earned_required_xp
-    
+        - コミットは呼び出し側で行う
+    """
+    results = await grant_experience(db, [(user_id, action, xp)])
+    return results[user_id]
+
+
+def rebuild_levels(db: Session) -> int:
+    """
+    台帳（user_activities）の合計から全ユーザーのレベル・経験値を作り直す
+
+    points は台帳以外でも増減しうるので対象外。
+
+    Returns:
+        int: 値がずれていて修正したユーザー数
+    """
+    totals = dict(
+        db.execute(
+            select(UserActivity.user_id, func.sum(UserActivity.xp_amount))
+            .group_by(UserActivity.user_id)
+        ).all()
+    )
+    fixes = []
+    for user_id, level, current_xp, experience_points in db.execute(
+        select(User.id, User.level, User.current_xp, User.experience_points)
+    ).all():
+        state = level_curve.state(int(totals.get(user_id) or 0))
+        if (level, current_xp, experience_points) != (state.level, state.current_xp, state.experience_points):
+            fixes.append({
+                "user_id": user_id,
+                "new_level": state.level,
+                "new_current_xp": state.current_xp,
+                "new_experience_points": state.experience_points,
+            })
+
+    table = User.__table__
+    stmt = (
+        table.update()
+        .where(table.c.id == bindparam("user_id"))
+        .values(
+            level=bindparam("new_level"),
+            current_xp=bindparam("new_current_xp"),
+            experience_points=bindparam("new_experience_points"),
+            updated_at=table.c.updated_at,
+        )
+    )
+    for start in range(0, len(fixes), LEDGER_BATCH_SIZE):
+        db.execute(stmt, fixes[start:start + LEDGER_BATCH_SIZE])
     db.commit()
-    
-    return {
-        "level_up": leveled_up,
-        "before_level": before_level,
-        "before_xp": before_xp,
-        "after_level": user.level,
-        "after_xp": user.current_xp,
-        "required_xp": required_xp
-    }
\ No newline at end of file
+    return len(fixes)
+
+
+if __name__ == "__main__":
+    from models.database import SessionLocal
+    import models.knowledge, models.comment, models.file, models.profile  # noqa: F401  マッパー設定用
+
+    db = SessionLocal()
+    try:
+        fixed = rebuild_levels(db)
+        print(f"✅ 台帳からレベルを作り直したユーザー数: {fixed}")
+    finally:
+        db.close()
@@ -0,0 +1,176 @@
+"""
+ナレッジ・コメント・アクティビティのエクスポート
+
+サーバーサイドカーソルで1000行ずつ読み出し、NDJSONまたはCSVとして書き出す。
+結果を全てメモリに載せないので、件数に関係なくメモリ使用量は一定。
+前回の実行で返したウォーターマーク（"日時|ID"）を since に渡すと、それ以降の差分だけを出力する。
+
+    python -m utils.export knowledges --format csv --since "2026-10-01T00:00:00|1234" > knowledges.csv
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Column, Select, Table, select, tuple_
+
+from core.config import settings
+
+from models.comment import Comment
+from models.knowledge import Knowledge
+from models.user_activity import UserActivity
+
+# サーバーサイドカーソルから一度に取り出す行数
+YIELD_PER = 1000
+
+# テーブル名 → (テーブル, ウォーターマークに使う日時カラム)
+EXPORT_TABLES: Dict[str, Tuple[Table, Column]] = {
+    "knowledges": (Knowledge.__table__, Knowledge.__table__.c.updated_at),
+    "comments": (Comment.__table__, Comment.__table__.c.created_at),
+    "user_activities": (UserActivity.__table__, UserActivity.__table__.c.timestamp),
+}
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+# ウォーターマーク: 最後に出力した行の (日時, ID)
+Watermark = Tuple[datetime, int]
+
+
+def format_watermark(watermark: Watermark) -> str:
+    timestamp, id = watermark
+    return f"{timestamp.isoformat()}|{id}"
+
+
+def parse_watermark(value: str) -> Watermark:
+    """
+    "日時|ID" 形式のウォーターマークを (日時, ID) に戻す
+
+    日時だけの値（以前の形式）はその日時の行から出力し直す（取りこぼさない代わりに重複しうる）。
+    不正な場合は ValueError。
+    """
+    timestamp, _, id = value.partition("|")
+    parsed = datetime.fromisoformat(timestamp)
+    if parsed.tzinfo is not None:
+        parsed = parsed.replace(tzinfo=None)
+    return parsed, int(id) if id else 0
+
+
+def next_watermark(since: Optional[Watermark], until: Optional[Watermark]) -> Optional[Watermark]:
+    """次回に渡すウォーターマーク（新しい行がなければ進めず、前回より戻すこともしない）"""
+    if until is None or (since is not None and tuple(until) <= since):
+        return since
+    return tuple(until)
+
+
+def export_cutoff() -> datetime:
+    """
+    今回出力する行の日時の上限
+
+    日時はコミット前にアプリで決まるため、出力時点でまだコミットされていない行が
+    出力済みの行より前の日時を持つことがある。直近 EXPORT_WATERMARK_LAG_SECONDS 秒の行は
+    次回に回し、その間に書き込み中のトランザクションがコミットされるのを待つ。
+    """
+    return datetime.utcnow() - timedelta(seconds=settings.EXPORT_WATERMARK_LAG_SECONDS)
+
+
+def watermark_query(name: str, cutoff: datetime) -> Select:
+    """今回の出力範囲の上限（cutoff 以前で最後の行の (日時, ID)）を求めるクエリ"""
+    table, column = EXPORT_TABLES[name]
+    return (
+        select(column, table.c.id)
+        .where(column <= cutoff)
+        .order_by(column.desc(), table.c.id.desc())
+        .limit(1)
+    )
+
+
+def export_query(name: str, since: Optional[Watermark], until: Optional[Watermark]) -> Select:
+    """
+    (日時, ID) が since より後、until 以前の行を日時・ID順に取得するクエリ
+
+    日時だけで比べると、同じ秒に書き込まれた行（MySQLの DATETIME は秒単位）を取りこぼすため、
+    IDと組にして比べる。until を実行開始時点で固定しておくことで、エクスポート中に追加された行は
+    次回の差分に回り、ウォーターマークとの間で取りこぼしや重複が起きない。
+    """
+    table, column = EXPORT_TABLES[name]
+    key = tuple_(column, table.c.id)
+    query = select(table).order_by(column, table.c.id)
+    if since is not None:
+        query = query.where(key > tuple_(*since))
+    if until is not None:
+        query = query.where(key <= tuple_(*until))
+    return query.execution_options(stream_results=True, yield_per=YIELD_PER)
+
+
+def columns(name: str) -> List[str]:
+    table, _ = EXPORT_TABLES[name]
+    return [c.name for c in table.columns]
+
+
+def _value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def format_header(fmt: str, names: List[str]) -> str:
+    if fmt != "csv":
+        return ""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(names)
+    # Excelで文字化けしないようBOMを付ける
+    return "\ufeff" + buffer.getvalue()
+
+
+def format_rows(fmt: str, names: List[str], rows: Iterable[Any]) -> str:
+    """行のまとまりをNDJSONまたはCSVの文字列にする"""
+    buffer = io.StringIO()
+    if fmt == "csv":
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([_value(v) for v in row])
+    else:
+        for row in rows:
+            buffer.write(json.dumps({k: _value(v) for k, v in zip(names, row)}, ensure_ascii=False))
+            buffer.write("\n")
+    return buffer.getvalue()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from models.database import engine
+    import models.user, models.file, models.blob, models.profile  # noqa: F401  マッパー設定用
+
+    parser = argparse.ArgumentParser(description="テーブルをNDJSON/CSVでエクスポートする")
+    parser.add_argument("table", choices=sorted(EXPORT_TABLES))
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="ndjson")
+    parser.add_argument("--since", type=parse_watermark, default=None,
+                        help="前回のウォーターマーク（\"日時|ID\"。この行より後の行だけを出力する）")
+    args = parser.parse_args(argv)
+
+    names = columns(args.table)
+    out = sys.stdout
+    with engine.connect() as connection:
+        until = connection.execute(watermark_query(args.table, export_cutoff())).first()
+        out.write(format_header(args.format, names))
+        count = 0
+        result = connection.execute(export_query(args.table, args.since, until))
+        for rows in result.partitions():
+            out.write(format_rows(args.format, names, rows))
+            count += len(rows)
+    # 次回の --since に渡す値（出力は標準出力なので、こちらは標準エラーに出す）
+    watermark = next_watermark(args.since, until)
+    print(
+        f"✅ {args.table}: {count}件を出力しました（ウォーターマーク: {format_watermark(watermark) if watermark else ''}）",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models.comment import Comment
+from models.file import File
+from models.knowledge import Knowledge
+
+
+async def adjust_knowledge_counts(db: AsyncSession, knowledge_id: int, comments: int = 0, files: int = 0) -> None:
+    """
+    ナレッジのコメント数・ファイル数を加減する
+
+    コメント・ファイルの追加/削除と同じトランザクションで呼ぶこと（コミットは呼び出し側で行う）。
+    件数の変更ではナレッジの更新日時を変えない。
+    """
+    await db.execute(
+        update(Knowledge)
+        .where(Knowledge.id == knowledge_id)
+        .values(
+            comment_count=Knowledge.comment_count + comments,
+            file_count=Knowledge.file_count + files,
+            updated_at=Knowledge.updated_at,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def reconcile_knowledge_counts(db: Session) -> int:
+    """
+    knowledges.comment_count / file_count を comments / files の実件数で作り直す
+
+    Returns:
+        int: 件数がずれていて修正したナレッジ数
+    """
+    actual_comments = (
+        select(func.count(Comment.id))
+        .where(Comment.knowledge_id == Knowledge.id)
+        .correlate(Knowledge)
+        .scalar_subquery()
+    )
+    actual_files = (
+        select(func.count(File.id))
+        .where(File.knowledge_id == Knowledge.id)
+        .correlate(Knowledge)
+        .scalar_subquery()
+    )
+    result = db.execute(
+        Knowledge.__table__.update()
+        .where((Knowledge.comment_count != actual_comments) | (Knowledge.file_count != actual_files))
+        .values(comment_count=actual_comments, file_count=actual_files, updated_at=Knowledge.updated_at)
+    )
+    db.commit()
+    return result.rowcount
+
+
+if __name__ == "__main__":
+    from models.database import SessionLocal
+    import models.user, models.blob, models.profile, models.user_activity  # noqa: F401  マッパー設定用
+
+    db = SessionLocal()
+    try:
+        fixed = reconcile_knowledge_counts(db)
+        print(f"✅ コメント数・ファイル数を修正したナレッジ数: {fixed}")
+    finally:
+        db.close()
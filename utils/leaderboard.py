@@ -0,0 +1,181 @@
+import threading
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional
+
+from sortedcontainers import SortedList
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.principal_cache import CurrentUser
+from models.user import User, build_avatar_url
+
+
+@dataclass
+class LeaderboardEntry:
+    """ランキング表示に必要なユーザー情報のスナップショット"""
+    id: int
+    username: Optional[str]
+    department: Optional[str]
+    level: int
+    experience_points: int
+    points: int
+    avatar_url: Optional[str]  # ランキング表示用の縮小版
+
+    @property
+    def level_key(self) -> tuple:
+        # レベル降順 → 累積経験値降順 → ID昇順
+        return (-self.level, -self.experience_points, self.id)
+
+    @property
+    def points_key(self) -> tuple:
+        return (-self.points, self.id)
+
+
+class Leaderboard:
+    """
+    レベル・ポイントのランキングをメモリ上で保持する
+
+    起動時にDBから構築し、経験値が変わったときは update()、
+    名前・所属・アバターが変わったときは update_profile() で差分更新する。上位N件の取得と順位の計算は O(log n)。
+    プロセス内で保持するため、gunicornのワーカーごとに1つ持つ。
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        self._entries: Dict[int, LeaderboardEntry] = {}
+        self._by_level = SortedList()
+        self._by_points = SortedList()
+
+    @property
+    def is_built(self) -> bool:
+        return self._built
+
+    async def rebuild(self, db: AsyncSession) -> None:
+        """DBの全ユーザーからランキングを作り直す"""
+        rows = (
+            await db.execute(
+                select(
+                    User.id,
+                    User.username,
+                    User.department,
+                    User.level,
+                    User.experience_points,
+                    User.points,
+                    User.avatar_etag,
+                )
+            )
+        ).all()
+        entries = {}
+        for row in rows:
+            entries[row.id] = LeaderboardEntry(
+                id=row.id,
+                username=row.username,
+                department=row.department,
+                level=row.level or 0,
+                experience_points=row.experience_points or 0,
+                points=row.points or 0,
+                avatar_url=build_avatar_url(row.id, row.avatar_etag, "small"),
+            )
+        with self._lock:
+            self._entries = entries
+            self._by_level = SortedList(e.level_key for e in entries.values())
+            self._by_points = SortedList(e.points_key for e in entries.values())
+            self._built = True
+
+    async def ensure_built(self, db: AsyncSession) -> None:
+        if not self._built:
+            await self.rebuild(db)
+
+    def update(self, user: CurrentUser) -> None:
+        """
+        経験値を加算したトランザクションが返したユーザーの状態をランキングに反映する
+
+        リクエスト開始時に読んだ User や認証キャッシュのスナップショットは渡さない
+        （その後にコミットされた経験値の加算を古い値で上書きしてしまうため）。
+        """
+        if not self._built:
+            return
+        entry = self._entry_for(user)
+        with self._lock:
+            self._put(entry)
+
+    def add_if_missing(self, user: CurrentUser) -> None:
+        """まだランキングにないユーザーを追加する（既にあれば、より新しいはずなので何もしない）"""
+        if not self._built:
+            return
+        entry = self._entry_for(user)
+        with self._lock:
+            if entry.id not in self._entries:
+                self._put(entry)
+
+    def update_profile(
+        self,
+        user_id: int,
+        username: Optional[str],
+        department: Optional[str],
+        avatar_url: Optional[str],
+    ) -> None:
+        """名前・所属・アバターだけを書き換える（レベル・ポイントは経験値の加算からだけ反映する）"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._entries[user_id] = replace(
+                    entry, username=username, department=department, avatar_url=avatar_url
+                )
+
+    def remove(self, user_id: int) -> None:
+        with self._lock:
+            self._discard(user_id)
+
+    def top_by_level(self, limit: int) -> List[LeaderboardEntry]:
+        with self._lock:
+            return [self._entries[key[-1]] for key in self._by_level.islice(0, limit)]
+
+    def top_by_points(self, limit: int) -> List[LeaderboardEntry]:
+        with self._lock:
+            return [self._entries[key[-1]] for key in self._by_points.islice(0, limit)]
+
+    def level_rank(self, user_id: int) -> Optional[int]:
+        """自分より上位（レベル・累積経験値が大きい）のユーザー数 + 1"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            return self._by_level.bisect_left((-entry.level, -entry.experience_points)) + 1
+
+    def points_rank(self, user_id: int) -> Optional[int]:
+        """自分よりポイントが多いユーザー数 + 1"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            return self._by_points.bisect_left((-entry.points,)) + 1
+
+    @staticmethod
+    def _entry_for(user: CurrentUser) -> LeaderboardEntry:
+        return LeaderboardEntry(
+            id=user.id,
+            username=user.username,
+            department=user.department,
+            level=user.level or 0,
+            experience_points=user.experience_points or 0,
+            points=user.points or 0,
+            avatar_url=user.small_avatar_url,
+        )
+
+    def _put(self, entry: LeaderboardEntry) -> None:
+        self._discard(entry.id)
+        self._entries[entry.id] = entry
+        self._by_level.add(entry.level_key)
+        self._by_points.add(entry.points_key)
+
+    def _discard(self, user_id: int) -> None:
+        old = self._entries.pop(user_id, None)
+        if old is not None:
+            self._by_level.discard(old.level_key)
+            self._by_points.discard(old.points_key)
+
+
+# アプリ全体で共有するランキング
+leaderboard = Leaderboard()
@@ -0,0 +1,89 @@
+"""
+ランキングのベンチマーク
+
+10万ユーザーのSQLiteデータベースで、従来のSQLによるランキング取得と
+メモリ上のランキング（utils.leaderboard）の処理時間を比較する。
+
+    python -m utils.leaderboard_benchmark [ユーザー数]
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from models.database import Base
+from models.user import User
+import models.knowledge, models.comment, models.file, models.blob, models.profile, models.user_activity  # noqa: F401  マッパー設定用
+from utils.leaderboard import Leaderboard
+
+
+def timed(label: str, fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed_ms = (time.perf_counter() - start) * 1000 / repeat
+    print(f"{label:<40} {elapsed_ms:10.3f} ms")
+    return elapsed_ms
+
+
+def run(user_count: int = 100_000, repeat: int = 50) -> None:
+    db_path = os.path.join(tempfile.mkdtemp(), "leaderboard_benchmark.db")
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(engine, tables=[User.__table__])
+    db = sessionmaker(bind=engine)()
+
+    rng = random.Random(0)
+    db.execute(
+        User.__table__.insert(),
+        [
+            {
+                "email": f"user{i}@example.com",
+                "username": f"user{i}",
+                "level": rng.randint(1, 50),
+                "experience_points": rng.randint(0, 5000),
+                "points": rng.randint(0, 10000),
+            }
+            for i in range(user_count)
+        ],
+    )
+    db.commit()
+    me = db.query(User).filter(User.id == user_count // 2).one()
+
+    print(f"ユーザー数: {user_count}")
+    start = time.perf_counter()
+    board = Leaderboard()
+
+    async def rebuild():
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        async with AsyncSession(async_engine) as async_db:
+            await board.rebuild(async_db)
+        await async_engine.dispose()
+    asyncio.run(rebuild())
+    print(f"{'leaderboard rebuild':<40} {(time.perf_counter() - start) * 1000:10.3f} ms")
+
+    timed("SQL   level top 5", lambda: db.query(User).order_by(User.level.desc(), User.experience_points.desc()).limit(5).all(), repeat)
+    timed("memory level top 5", lambda: board.top_by_level(5), repeat)
+    timed("SQL   points top 5", lambda: db.query(User).order_by(User.points.desc()).limit(5).all(), repeat)
+    timed("memory points top 5", lambda: board.top_by_points(5), repeat)
+    timed("SQL   my level rank", lambda: db.query(func.count(User.id)).filter(
+        (User.level > me.level) |
+        ((User.level == me.level) & (User.experience_points > me.experience_points))
+    ).scalar(), repeat)
+    timed("memory my level rank", lambda: board.level_rank(me.id), repeat)
+    timed("SQL   my points rank", lambda: db.query(func.count(User.id)).filter(User.points > me.points).scalar(), repeat)
+    timed("memory my points rank", lambda: board.points_rank(me.id), repeat)
+
+    def bump():
+        me.experience_points += 1
+        board.update(me)
+    timed("memory update (経験値の変更)", bump, repeat)
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
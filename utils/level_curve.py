@@ -0,0 +1,60 @@
+from bisect import bisect_right
+from dataclasses import dataclass
+from itertools import accumulate
+from typing import List
+
+from core.config import settings
+
+
+@dataclass
+class LevelState:
+    level: int
+    current_xp: int  # 現在のレベルに入ってから獲得した経験値
+    experience_points: int  # 到達済みのレベルに必要だった経験値の合計
+    required_xp: int  # 次のレベルまでに必要な経験値（現在のレベル分）
+
+
+class LevelCurve:
+    """
+    累積経験値からレベルを求めるためのテーブル
+
+    requirements[i] はレベル i+1 → i+2 に必要な経験値。テーブルより上のレベルは最後の値を繰り返す。
+    累積値の配列を二分探索するので、レベルが高くても O(log n) で求まる。
+    """
+
+    def __init__(self, requirements: List[int]):
+        if not requirements or any(r <= 0 for r in requirements):
+            raise ValueError("レベルアップに必要な経験値は1以上で指定してください")
+        self.requirements = list(requirements)
+        self.thresholds = list(accumulate(self.requirements))
+
+    @classmethod
+    def parse(cls, value: str) -> "LevelCurve":
+        return cls([int(v) for v in value.split(",") if v.strip()])
+
+    def required_xp(self, level: int) -> int:
+        """レベル level から次のレベルに上がるのに必要な経験値"""
+        return self.requirements[min(max(level, 1), len(self.requirements)) - 1]
+
+    def state(self, total_xp: int) -> LevelState:
+        """累積経験値からレベル・レベル内の経験値を求める"""
+        total_xp = max(total_xp, 0)
+        reached = bisect_right(self.thresholds, total_xp)
+        if reached < len(self.thresholds):
+            experience_points = self.thresholds[reached - 1] if reached else 0
+        else:
+            # テーブルの最後より上は一定の経験値ごとにレベルが上がる
+            extra = (total_xp - self.thresholds[-1]) // self.requirements[-1]
+            reached += extra
+            experience_points = self.thresholds[-1] + extra * self.requirements[-1]
+        level = reached + 1
+        return LevelState(
+            level=level,
+            current_xp=total_xp - experience_points,
+            experience_points=experience_points,
+            required_xp=self.required_xp(level),
+        )
+
+
+# アプリ全体で共有するレベルテーブル
+level_curve = LevelCurve.parse(settings.LEVEL_XP_REQUIREMENTS)
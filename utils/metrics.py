@@ -0,0 +1,204 @@
+"""
+Prometheus形式のメトリクス（GET /metrics）
+
+gunicorn で複数ワーカーを動かす場合は、起動前に環境変数 PROMETHEUS_MULTIPROC_DIR に
+空のディレクトリを指定する（gunicorn.conf.py で設定している）。各ワーカーはそこに値を書き、
+/metrics はどのワーカーが受けても全ワーカーを合算した値を返す。
+指定しない場合（uvicorn 単体での起動など）はそのプロセスの値だけを返す。
+
+キャッシュのヒット率は次のように求める:
+    rate(rebema_cache_hits_total[5m]) / (rate(rebema_cache_hits_total[5m]) + rate(rebema_cache_misses_total[5m]))
+"""
+import os
+import threading
+import time
+from typing import Dict, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+
+from models.pool import InstrumentedAsyncQueuePool
+
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+# 実行時の統計（プール・キャッシュ）を反映する最短間隔
+RUNTIME_SYNC_INTERVAL_SECONDS = 1.0
+
+# ルートに一致しなかったリクエスト（404など）のラベル。パスをそのまま使うと系列が増え続けるため
+UNMATCHED_ROUTE = "unmatched"
+
+http_requests_total = Counter(
+    "rebema_http_requests_total", "HTTPリクエスト数", ["method", "route", "status"]
+)
+http_request_duration_seconds = Histogram(
+    "rebema_http_request_duration_seconds", "HTTPリクエストの処理時間", ["method", "route"]
+)
+http_requests_in_progress = Gauge(
+    "rebema_http_requests_in_progress", "処理中のHTTPリクエスト数", ["method"], multiprocess_mode="livesum"
+)
+
+db_pool_connections = Gauge(
+    "rebema_db_pool_connections", "コネクションプールの接続数", ["state"], multiprocess_mode="livesum"
+)
+db_pool_checkouts_total = Counter("rebema_db_pool_checkouts_total", "プールからの接続の取得回数")
+db_pool_checkout_wait_seconds_total = Counter(
+    "rebema_db_pool_checkout_wait_seconds_total", "プールからの接続の取得待ち時間の合計"
+)
+db_pool_overflow_events_total = Counter(
+    "rebema_db_pool_overflow_events_total", "プールサイズを超えて接続を作った回数"
+)
+db_pool_timeouts_total = Counter("rebema_db_pool_timeouts_total", "プールからの接続の取得がタイムアウトした回数")
+
+cache_hits_total = Counter("rebema_cache_hits_total", "キャッシュから返した回数", ["cache", "route"])
+cache_misses_total = Counter("rebema_cache_misses_total", "キャッシュになく計算した回数", ["cache", "route"])
+cache_entries = Gauge(
+    "rebema_cache_entries", "キャッシュのエントリ数", ["cache"], multiprocess_mode="livesum"
+)
+
+unit_of_work_requests_total = Counter(
+    "rebema_unit_of_work_requests_total", "リクエストのトランザクション数（コミット数ごと）", ["commits"]
+)
+unit_of_work_commits_total = Counter("rebema_unit_of_work_commits_total", "リクエストのトランザクションでのコミット数")
+unit_of_work_rollbacks_total = Counter(
+    "rebema_unit_of_work_rollbacks_total", "例外でロールバックしたリクエストのトランザクション数"
+)
+
+password_hash_queue_depth = Gauge(
+    "rebema_password_hash_queue_depth", "bcryptの実行待ちの数", multiprocess_mode="livesum"
+)
+password_hash_rejected_total = Counter(
+    "rebema_password_hash_rejected_total", "bcryptの待ちが上限を超えて503を返した回数"
+)
+
+
+class _RuntimeStats:
+    """
+    各コンポーネントの累積値（stats()）との差分をカウンターに加える
+
+    コンポーネント側にPrometheusの処理を持ち込まないよう、値はここで定期的に読み取る。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last: Dict[Tuple, float] = {}
+        self._synced_at = 0.0
+
+    def _inc(self, counter, value: float, *labels: str) -> None:
+        key = (counter._name, labels)
+        delta = value - self._last.get(key, 0.0)
+        self._last[key] = value
+        if delta > 0:
+            (counter.labels(*labels) if labels else counter).inc(delta)
+
+    def sync(self, force: bool = False) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._synced_at < RUNTIME_SYNC_INTERVAL_SECONDS:
+                return
+            self._synced_at = now
+            self._sync_pool()
+            self._sync_caches()
+            self._sync_unit_of_work()
+            self._sync_password_hasher()
+
+    def _sync_pool(self) -> None:
+        from models.database import async_engine
+
+        pool = async_engine.pool
+        if not isinstance(pool, InstrumentedAsyncQueuePool):
+            return
+        stats = InstrumentedAsyncQueuePool.metrics.stats(pool)
+        db_pool_connections.labels("checked_out").set(stats["checked_out"])
+        db_pool_connections.labels("idle").set(stats["idle"])
+        db_pool_connections.labels("overflow").set(stats["overflow"])
+        self._inc(db_pool_checkouts_total, stats["checkouts"])
+        self._inc(db_pool_checkout_wait_seconds_total, stats["checkout_wait_seconds_total"])
+        self._inc(db_pool_overflow_events_total, stats["overflow_events"])
+        self._inc(db_pool_timeouts_total, stats["timeouts"])
+
+    def _sync_caches(self) -> None:
+        from core.security import principal_cache
+        from utils.response_cache import response_cache
+
+        stats = principal_cache.stats()
+        cache_entries.labels("principal").set(stats["size"])
+        self._inc(cache_hits_total, stats["hits"], "principal", "")
+        self._inc(cache_misses_total, stats["misses"], "principal", "")
+
+        stats = response_cache.stats()
+        cache_entries.labels("response").set(stats["size"])
+        for route, route_stats in stats["routes"].items():
+            served = route_stats["hits"] + route_stats["stale_hits"] + route_stats["coalesced"]
+            self._inc(cache_hits_total, served, "response", route)
+            self._inc(cache_misses_total, route_stats["misses"], "response", route)
+
+    def _sync_unit_of_work(self) -> None:
+        from models.unit_of_work import unit_of_work_metrics
+
+        stats = unit_of_work_metrics.stats()
+        for commits, count in stats["commits_per_request"].items():
+            self._inc(unit_of_work_requests_total, count, commits)
+        self._inc(unit_of_work_commits_total, stats["commits"])
+        self._inc(unit_of_work_rollbacks_total, stats["rollbacks"])
+
+    def _sync_password_hasher(self) -> None:
+        from core.security import password_hasher
+
+        stats = password_hasher.stats()
+        password_hash_queue_depth.set(stats["queue_depth"])
+        self._inc(password_hash_rejected_total, stats["rejected"])
+
+
+runtime_stats = _RuntimeStats()
+
+
+def render() -> Tuple[bytes, str]:
+    """/metrics の本文と Content-Type を返す"""
+    runtime_stats.sync(force=True)
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """リクエスト数・処理時間・処理中の数をルート（パスのテンプレート）ごとに記録するASGIミドルウェア"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        started_at = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_progress.labels(method).inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_progress.labels(method).dec()
+            # ルーティング後の scope にはマッチしたルートが入っている
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or UNMATCHED_ROUTE
+            http_request_duration_seconds.labels(method, route_path).observe(time.perf_counter() - started_at)
+            http_requests_total.labels(method, route_path, str(status_code)).inc()
+            runtime_stats.sync()
@@ -0,0 +1,52 @@
+"""
+ルートごとのクエリ数の上限を確認する pytest フィクスチャ
+
+    def test_knowledge_list(client, query_budget):
+        with query_budget(3):
+            client.get("/knowledge/")
+
+ブロック内のリクエストのどれかが上限を超えるクエリを発行すると、そのテストを失敗させる。
+QueryStatsMiddleware を登録したアプリ（main.app）に対して使う。
+"""
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
+
+import pytest
+
+from utils.query_stats import QueryStats, add_listener, remove_listener
+
+
+class QueryBudget:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: List[Tuple[str, str, QueryStats]] = []
+
+    def record(self, method: str, path: str, stats: QueryStats) -> None:
+        with self._lock:
+            self.requests.append((method, path, stats))
+
+    @contextmanager
+    def __call__(self, max_queries: int) -> Iterator[None]:
+        with self._lock:
+            start = len(self.requests)
+        yield
+        with self._lock:
+            requests = self.requests[start:]
+        over = [
+            f"{method} {path}: {stats.queries}件（上限 {max_queries}件）\n"
+            + "\n".join(f"    {count}回: {shape[:200]}" for shape, count in stats.shapes.most_common(5))
+            for method, path, stats in requests
+            if stats.queries > max_queries
+        ]
+        if over:
+            pytest.fail("クエリ数が上限を超えました\n" + "\n".join(over), pytrace=False)
+
+
+@pytest.fixture
+def query_budget() -> Iterator[QueryBudget]:
+    """with query_budget(上限): の中のリクエストがクエリ数の上限を超えたらテストを失敗させる"""
+    budget = QueryBudget()
+    add_listener(budget.record)
+    yield budget
+    remove_listener(budget.record)
@@ -0,0 +1,166 @@
+"""
+リクエストごとのSQL計測
+
+SQLAlchemy のエンジンイベントで、リクエストごとにクエリ数・DB時間・コミット数・同じ形のクエリの回数を数える。
+QueryStatsMiddleware を登録すると、レスポンスに Server-Timing ヘッダーを付け（本番環境では付けない）、
+同じ形のクエリが SQL_N_PLUS_ONE_THRESHOLD 回以上実行されたリクエストを N+1 の疑いとして警告する。
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# パラメータや IN の要素数が違うだけのクエリを同じ形とみなすための正規化
+_IN_LIST = re.compile(r"\(\s*(?:\?|%s|:\w+)(?:\s*,\s*(?:\?|%s|:\w+))*\s*\)")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+\b")
+_SPACES = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    shape = _STRING.sub("?", statement)
+    shape = _NUMBER.sub("?", shape)
+    shape = _IN_LIST.sub("(?)", shape)
+    return _SPACES.sub(" ", shape).strip()
+
+
+class QueryStats:
+    """1リクエスト分の計測値"""
+
+    def __init__(self):
+        self.queries = 0
+        self.commits = 0
+        self.db_seconds = 0.0
+        self.shapes: Counter = Counter()
+
+    def repeated_shapes(self, threshold: int) -> List[Tuple[str, int]]:
+        """threshold 回以上実行された SELECT の形（N+1 の疑い）"""
+        return [
+            (shape, count)
+            for shape, count in self.shapes.most_common()
+            if count >= threshold and shape.upper().startswith("SELECT")
+        ]
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} queries", '
+            f'db-commits;desc="{self.commits}"'
+        )
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+# リクエスト終了時に (method, path, stats) を受け取るリスナー（テストのクエリ数の上限チェックなど）
+_listeners: List[Callable[[str, str, QueryStats], None]] = []
+_listeners_lock = threading.Lock()
+
+
+def add_listener(listener: Callable[[str, str, QueryStats], None]) -> None:
+    with _listeners_lock:
+        _listeners.append(listener)
+
+
+def remove_listener(listener: Callable[[str, str, QueryStats], None]) -> None:
+    with _listeners_lock:
+        _listeners.remove(listener)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """このブロックの中で実行されたクエリを数える"""
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def instrument(engine: Engine) -> None:
+    """エンジンにクエリ計測用のイベントを登録する（非同期エンジンは sync_engine を渡す）"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        stats = _current.get()
+        if stats is not None:
+            conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stats = _current.get()
+        if stats is None:
+            return
+        started = conn.info.get("query_started_at")
+        if started:
+            stats.db_seconds += time.perf_counter() - started.pop()
+        stats.queries += 1
+        stats.shapes[statement_shape(statement)] += 1
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        started = exception_context.connection.info.get("query_started_at") if exception_context.connection else None
+        if started:
+            started.pop()
+
+    @event.listens_for(engine, "commit")
+    def _commit(conn):
+        stats = _current.get()
+        if stats is not None:
+            stats.commits += 1
+
+
+class QueryStatsMiddleware:
+    """
+    リクエストごとにクエリを数え、Server-Timing ヘッダーを付けるASGIミドルウェア
+
+    Server-Timing はクエリ数などの内部情報をクライアントに見せるため、既定では
+    ENVIRONMENT が production 以外のときだけ付ける。
+    ヘッダーはレスポンスの送信開始時点までの値なので、ストリーミングで返す本文の中で
+    実行されたクエリは含まれない（警告とリスナーには含まれる）。
+    """
+
+    def __init__(self, app, threshold: Optional[int] = None, server_timing: Optional[bool] = None):
+        # pytest のプラグイン（utils.pytest_query_budget）から読み込まれたときに設定を必須にしないよう、ここで読み込む
+        from core.config import settings
+
+        self.app = app
+        self.threshold = threshold or settings.SQL_N_PLUS_ONE_THRESHOLD
+        self.server_timing = settings.ENVIRONMENT != "production" if server_timing is None else server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+            async def send_with_timing(message):
+                if message["type"] == "http.response.start" and self.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", stats.server_timing().encode("latin-1")))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                self._finish(scope, stats)
+
+    def _finish(self, scope, stats: QueryStats) -> None:
+        method, path = scope.get("method", ""), scope.get("path", "")
+        for shape, count in stats.repeated_shapes(self.threshold):
+            logger.warning(
+                "N+1の疑い: %s %s で同じ形のクエリが%d回実行されました: %s", method, path, count, shape[:200]
+            )
+        with _listeners_lock:
+            listeners = list(_listeners)
+        for listener in listeners:
+            listener(method, path, stats)
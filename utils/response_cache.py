@@ -0,0 +1,180 @@
+import asyncio
+import fnmatch
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set
+from urllib.parse import urlencode
+
+from core.config import settings
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "tags")
+
+    def __init__(self, value: Any, expires_at: float, tags: Set[str]):
+        self.value = value
+        self.expires_at = expires_at
+        self.tags = tags
+
+
+class _RouteStats:
+    __slots__ = ("hits", "stale_hits", "coalesced", "misses")
+
+    def __init__(self):
+        self.hits = 0
+        self.stale_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+
+    def as_dict(self) -> Dict[str, float]:
+        served = self.hits + self.stale_hits + self.coalesced
+        total = served + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hit_ratio": served / total if total else 0.0,
+        }
+
+
+class ResponseCache:
+    """
+    認証不要の読み取りAPIのレスポンスをTTL付きで保持するキャッシュ
+
+    キーはルート名とクエリパラメータ。各エントリにはタグを付けておき、
+    書き込み処理から invalidate("ranking:*") のようにタグで無効化する。
+    期限切れのエントリは1つのリクエストだけが作り直し、その間の他のリクエストには
+    古い値を返す（古い値がなければ作り直しの完了を待つ）。
+    プロセス内で保持するため、gunicornのワーカー間では無効化が伝わらない（TTLで追いつく）。
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # 無効化の前後関係を判定するための通し番号
+        self._clock = 0
+        self._invalidated_at: Dict[str, int] = {}
+        self._known_tags: Set[str] = set()
+        self._stats: Dict[str, _RouteStats] = {}
+
+    @staticmethod
+    def make_key(route: str, params: Optional[Dict[str, Any]] = None) -> str:
+        if not params:
+            return route
+        return f"{route}?{urlencode(sorted(params.items()))}"
+
+    async def get_or_compute(
+        self,
+        route: str,
+        params: Optional[Dict[str, Any]],
+        compute: Callable[[], Awaitable[Any]],
+        ttl: float,
+        tags: Iterable[str] = (),
+    ) -> Any:
+        """
+        キャッシュがあれば返し、なければ compute() の結果を保存して返す
+
+        route 自体もタグとして付ける（route="ranking:level" なら invalidate("ranking:*") で消える）。
+        """
+        key = self.make_key(route, params)
+        now = time.monotonic()
+        leader = False
+        with self._lock:
+            stats = self._stats.setdefault(route, _RouteStats())
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                stats.hits += 1
+                return entry.value
+
+            future = self._inflight.get(key)
+            if future is not None:
+                if entry is not None:
+                    # 作り直し中は古い値を返す
+                    stats.stale_hits += 1
+                    return entry.value
+                stats.coalesced += 1
+            else:
+                stats.misses += 1
+                future = asyncio.get_running_loop().create_future()
+                self._inflight[key] = future
+                leader = True
+                entry_tags = set(tags) | {route}
+                self._known_tags.update(entry_tags)
+                started_at = self._clock
+
+        if not leader:
+            try:
+                return await asyncio.shield(future)
+            except Exception:
+                # 作り直したリクエストが失敗した場合は自分で計算する（キャッシュはしない）
+                return await compute()
+
+        try:
+            value = await compute()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e if isinstance(e, Exception) else RuntimeError("キャッシュの作成が中断されました"))
+            # 待っている側が例外を受け取らなかった場合の警告を抑える
+            future.exception()
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            # 計算中に無効化されていたら保存しない（古いデータを残さない）
+            if not any(self._invalidated_at.get(tag, -1) > started_at for tag in entry_tags):
+                self._entries[key] = _Entry(value, time.monotonic() + ttl, entry_tags)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        future.set_result(value)
+        return value
+
+    def invalidate(self, *patterns: str) -> int:
+        """
+        タグが patterns（"ranking:*" のようなワイルドカード可）に一致するエントリを消す
+
+        Returns:
+            int: 削除したエントリ数
+        """
+        with self._lock:
+            self._clock += 1
+            matched = {
+                tag for tag in self._known_tags
+                if any(fnmatch.fnmatchcase(tag, pattern) for pattern in patterns)
+            }
+            for tag in matched:
+                self._invalidated_at[tag] = self._clock
+            stale_keys = [key for key, entry in self._entries.items() if entry.tags & matched]
+            for key in stale_keys:
+                del self._entries[key]
+            return len(stale_keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            routes = {route: stats.as_dict() for route, stats in self._stats.items()}
+            totals = _RouteStats()
+            for stats in self._stats.values():
+                totals.hits += stats.hits
+                totals.stale_hits += stats.stale_hits
+                totals.coalesced += stats.coalesced
+                totals.misses += stats.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                **totals.as_dict(),
+                "routes": routes,
+            }
+
+
+# アプリ全体で共有するレスポンスキャッシュ
+response_cache = ResponseCache(max_size=settings.RESPONSE_CACHE_MAX_SIZE)
@@ -0,0 +1,230 @@
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.knowledge import Knowledge
+
+# 検索対象のフィールドと重み（タイトルの一致を最も高く評価する）
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "method": 1.5,
+    "target": 1.5,
+    "description": 1.0,
+}
+
+# BM25のパラメータ
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 英数字は単語単位、日本語（ひらがな・カタカナ・漢字）は連続部分をbi-gramに分割する
+_WORD_RE = re.compile(r"[0-9a-z]+|[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff]+")
+_CJK_RE = re.compile(r"[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff]")
+
+
+def normalize(text: str) -> str:
+    """全角・半角の揺れをNFKCで吸収し、小文字に揃える"""
+    return unicodedata.normalize("NFKC", text or "").lower()
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    テキストをトークン列に分割する
+
+    英数字の連続は1語、日本語の連続はbi-gram（1文字だけの場合はそのまま）にする
+    """
+    tokens = []
+    for run in _WORD_RE.findall(normalize(text)):
+        if not _CJK_RE.match(run):
+            tokens.append(run)
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class KnowledgeSearchIndex:
+    """
+    ナレッジ用のインメモリ転置インデックス
+
+    title / method / target / description を対象にBM25でスコアリングする。
+    プロセス内で保持するため、初回検索時にDBから構築し、
+    以降は create / update / delete のたびに差分更新する。
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        # 構築中（SELECT の後にコミットされた分を取りこぼさないよう、構築中の変更を記録して最後に反映する）
+        self._builds_in_progress = 0
+        self._changes_during_build: Dict[int, Optional[Dict[str, Optional[str]]]] = {}
+        # 構築中に invalidate() されたかを判定するための通し番号
+        self._invalidations = 0
+        self._postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self._doc_tokens: Dict[int, List[str]] = {}
+        self._doc_lengths: Dict[int, float] = {}
+        self._total_length = 0.0
+
+    @property
+    def is_built(self) -> bool:
+        return self._built
+
+    async def build(self, db: AsyncSession) -> None:
+        """
+        DBの全ナレッジからインデックスを作り直す
+
+        SELECT の実行中にコミットされた追加・更新・削除は、読み込んだ行の上に反映し直す。
+        構築中に invalidate() された場合は、次回の検索時にもう一度作り直す。
+        """
+        with self._lock:
+            self._builds_in_progress += 1
+            started_at = self._invalidations
+        try:
+            rows = (
+                await db.execute(
+                    select(
+                        Knowledge.id,
+                        Knowledge.title,
+                        Knowledge.method,
+                        Knowledge.target,
+                        Knowledge.description,
+                    )
+                )
+            ).all()
+        except BaseException:
+            with self._lock:
+                self._finish_build()
+            raise
+        with self._lock:
+            self._clear()
+            for row in rows:
+                self._add(row.id, row._asdict())
+            for doc_id, fields in self._changes_during_build.items():
+                self._remove(doc_id)
+                if fields is not None:
+                    self._add(doc_id, fields)
+            self._built = self._invalidations == started_at
+            self._finish_build()
+
+    async def ensure_built(self, db: AsyncSession) -> None:
+        if not self._built:
+            await self.build(db)
+
+    def invalidate(self) -> None:
+        """次回の検索時にDBから再構築させる"""
+        with self._lock:
+            self._clear()
+            self._built = False
+            self._invalidations += 1
+
+    def add(self, knowledge: Knowledge) -> None:
+        """ナレッジを追加する（既に登録済みなら置き換える）"""
+        fields = {name: getattr(knowledge, name) for name in FIELD_WEIGHTS}
+        with self._lock:
+            self._record_change(knowledge.id, fields)
+            if self._built:
+                self._remove(knowledge.id)
+                self._add(knowledge.id, fields)
+
+    def remove(self, knowledge_id: int) -> None:
+        with self._lock:
+            self._record_change(knowledge_id, None)
+            if self._built:
+                self._remove(knowledge_id)
+
+    def search(self, query: str, limit: int = 20, offset: int = 0) -> Tuple[List[Tuple[int, float]], int]:
+        """
+        クエリに一致するナレッジをスコア順に返す
+
+        Returns:
+            Tuple[List[Tuple[int, float]], int]: (ナレッジID, スコア) のリストと一致総数
+        """
+        query_tokens = list(dict.fromkeys(tokenize(query)))
+        if not query_tokens:
+            return [], 0
+
+        with self._lock:
+            doc_count = len(self._doc_lengths)
+            if doc_count == 0:
+                return [], 0
+            avg_length = self._total_length / doc_count
+
+            scores: Optional[Dict[int, float]] = None
+            for token in query_tokens:
+                postings = self._postings_for(token)
+                if not postings:
+                    return [], 0
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                token_scores = {}
+                for doc_id, tf in postings.items():
+                    # 全トークンを含む文書だけを残す（AND検索）
+                    if scores is not None and doc_id not in scores:
+                        continue
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_lengths[doc_id] / avg_length)
+                    token_scores[doc_id] = (scores or {}).get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+                scores = token_scores
+                if not scores:
+                    return [], 0
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+        return ranked[offset:offset + limit], len(ranked)
+
+    def _postings_for(self, token: str) -> Dict[int, float]:
+        # 1文字の日本語クエリはその文字を含むbi-gramをまとめて対象にする
+        if len(token) == 1 and _CJK_RE.match(token):
+            merged: Dict[int, float] = dict(self._postings.get(token, {}))
+            for vocab, postings in self._postings.items():
+                if len(vocab) == 2 and token in vocab:
+                    for doc_id, tf in postings.items():
+                        merged[doc_id] = merged.get(doc_id, 0.0) + tf
+            return merged
+        return self._postings.get(token, {})
+
+    def _add(self, doc_id: int, fields: Dict[str, Optional[str]]) -> None:
+        weighted_tf: Counter = Counter()
+        for name, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(fields.get(name) or ""):
+                weighted_tf[token] += weight
+        for token, tf in weighted_tf.items():
+            self._postings[token][doc_id] = tf
+        length = sum(weighted_tf.values())
+        self._doc_tokens[doc_id] = list(weighted_tf)
+        self._doc_lengths[doc_id] = length
+        self._total_length += length
+
+    def _remove(self, doc_id: int) -> None:
+        tokens: Iterable[str] = self._doc_tokens.pop(doc_id, ())
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[token]
+        self._total_length -= self._doc_lengths.pop(doc_id, 0.0)
+
+    def _record_change(self, doc_id: int, fields: Optional[Dict[str, Optional[str]]]) -> None:
+        # 構築中でなければ記録しない（構築していないなら次回の構築で読み込まれる）
+        if self._builds_in_progress:
+            self._changes_during_build[doc_id] = fields
+
+    def _finish_build(self) -> None:
+        self._builds_in_progress -= 1
+        if not self._builds_in_progress:
+            self._changes_during_build = {}
+
+    def _clear(self) -> None:
+        self._postings = defaultdict(dict)
+        self._doc_tokens = {}
+        self._doc_lengths = {}
+        self._total_length = 0.0
+
+
+# アプリ全体で共有するインデックス（gunicornのワーカーごとに1つ）
+search_index = KnowledgeSearchIndex()
@@ -0,0 +1,100 @@
+import asyncio
+import threading
+from typing import Dict, Optional
+
+from sqlalchemy import case, func
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from models.knowledge import Knowledge
+
+
+class ViewCountBuffer:
+    """
+    ナレッジ閲覧数の書き込みバッファ
+
+    閲覧のたびにコミットせず、プロセス内で加算しておき、
+    一定間隔で1本の UPDATE ... SET views = views + CASE ... にまとめて反映する。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[int, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._bind: Optional[AsyncEngine] = None
+
+    def increment(self, knowledge_id: int, count: int = 1) -> None:
+        with self._lock:
+            self._pending[knowledge_id] = self._pending.get(knowledge_id, 0) + count
+
+    def pending(self, knowledge_id: int) -> int:
+        """まだDBに反映されていない閲覧数"""
+        with self._lock:
+            return self._pending.get(knowledge_id, 0)
+
+    async def flush(self, bind: AsyncEngine) -> int:
+        """
+        溜まった閲覧数をDBへ反映する
+
+        Returns:
+            int: 更新対象になったナレッジ数
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        table = Knowledge.__table__
+        stmt = (
+            table.update()
+            .where(table.c.id.in_(list(pending)))
+            .values(
+                views=func.coalesce(table.c.views, 0) + case(pending, value=table.c.id, else_=0),
+                # 閲覧数の反映ではナレッジの更新日時を変えない
+                updated_at=table.c.updated_at,
+            )
+        )
+        try:
+            async with bind.begin() as connection:
+                await connection.execute(stmt)
+        except BaseException:
+            # 失敗した分（キャンセルされた場合も含む）は次回の反映に回す
+            with self._lock:
+                for knowledge_id, count in pending.items():
+                    self._pending[knowledge_id] = self._pending.get(knowledge_id, 0) + count
+            raise
+        return len(pending)
+
+    def start(self, bind: AsyncEngine, interval: float) -> None:
+        """定期反映タスクを開始する（アプリ起動時に呼ぶ）"""
+        self._bind = bind
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self._run(interval))
+
+    async def stop(self) -> None:
+        """
+        定期反映タスクを止め、残りを反映する（アプリ終了時に呼ぶ）
+
+        タスクはキャンセルせず、反映中ならその完了を待ってから止める（取り出した分を失わないため）。
+        """
+        if self._task is not None:
+            self._stopping.set()
+            await self._task
+            self._task = None
+        if self._bind is not None:
+            await self.flush(self._bind)
+
+    async def _run(self, interval: float) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush(self._bind)
+            except Exception as e:
+                print(f"閲覧数の反映エラー: {str(e)}")
+
+
+# アプリ全体で共有する閲覧数バッファ
+view_counter = ViewCountBuffer()